@@ -7,14 +7,19 @@ import hashlib
 import hmac
 import base64
 import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 import bcrypt
 import logging
 
-from backend.models.models import User
+from backend.models.models import User, _utcnow
 from backend.models.models import (
     UserRegisterRequest, UserLoginRequest, UserResponse, 
     TokenResponse, PasswordChangeRequest, PasswordResetRequest
@@ -22,6 +27,62 @@ from backend.models.models import (
 
 logger = logging.getLogger(__name__)
 
+# Dedicated pool for bcrypt hashing/verification so password work has its own
+# concurrency budget and does not compete with DB/file work in the default executor
+BCRYPT_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv('BCRYPT_POOL_WORKERS', min(os.cpu_count() or 1, 8))),
+    thread_name_prefix="bcrypt"
+)
+
+def _encode_jwt(to_encode: Dict[str, Any], secret_key: str, algorithm: str) -> str:
+    """Encode and sign a JWT payload"""
+    # Simple JWT implementation using HMAC
+    header = {"alg": algorithm, "typ": "JWT"}
+    header_b64 = base64.urlsafe_b64encode(
+        json.dumps(header, separators=(',', ':')).encode()
+    ).decode().rstrip('=')
+    
+    payload_b64 = base64.urlsafe_b64encode(
+        json.dumps(to_encode, default=str, separators=(',', ':')).encode()
+    ).decode().rstrip('=')
+    
+    signature = hmac.new(
+        secret_key.encode(),
+        f"{header_b64}.{payload_b64}".encode(),
+        hashlib.sha256
+    ).digest()
+    signature_b64 = base64.urlsafe_b64encode(signature).decode().rstrip('=')
+    
+    return f"{header_b64}.{payload_b64}.{signature_b64}"
+
+@lru_cache(maxsize=2048)
+def _sign_access_token(
+    secret_key: str,
+    algorithm: str,
+    lifetime_seconds: int,
+    user_id: str,
+    email: Optional[str],
+    username: Optional[str],
+    issued_minute: int
+) -> Tuple[str, int]:
+    """Sign an access token issued in the given minute; returns (token, exp)
+    
+    Cached so repeated logins by the same user within a minute reuse the signature.
+    iat is the start of the minute and exp counts from its end, so no token lives
+    shorter than the configured lifetime.
+    """
+    issued_at = issued_minute * 60
+    expires_at = issued_at + 60 + lifetime_seconds
+    token_data = {
+        "sub": user_id,
+        "email": email,
+        "username": username,
+        "type": "access",
+        "exp": expires_at,
+        "iat": issued_at
+    }
+    return _encode_jwt(token_data, secret_key, algorithm), expires_at
+
 class AuthService:
     """Authentication service for user management"""
     
@@ -53,6 +114,16 @@ class AuthService:
             logger.error(f"Password verification error: {e}")
             return False
     
+    async def hash_password_async(self, password: str) -> str:
+        """Hash a password on the bcrypt worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(BCRYPT_POOL, self.hash_password, password)
+    
+    async def verify_password_async(self, password: str, hashed: str) -> bool:
+        """Verify a password on the bcrypt worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(BCRYPT_POOL, self.verify_password, password, hashed)
+    
     def create_token(self, data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT token"""
         to_encode = data.copy()
@@ -63,24 +134,11 @@ class AuthService:
         
         to_encode.update({"exp": expire.timestamp(), "iat": datetime.now(timezone.utc).timestamp()})
         
-        # Simple JWT implementation using HMAC
-        header = {"alg": self.algorithm, "typ": "JWT"}
-        header_b64 = base64.urlsafe_b64encode(
-            json.dumps(header, separators=(',', ':')).encode()
-        ).decode().rstrip('=')
-        
-        payload_b64 = base64.urlsafe_b64encode(
-            json.dumps(to_encode, default=str, separators=(',', ':')).encode()
-        ).decode().rstrip('=')
-        
-        signature = hmac.new(
-            self.secret_key.encode(),
-            f"{header_b64}.{payload_b64}".encode(),
-            hashlib.sha256
-        ).digest()
-        signature_b64 = base64.urlsafe_b64encode(signature).decode().rstrip('=')
-        
-        return f"{header_b64}.{payload_b64}.{signature_b64}"
+        return self._encode_token(to_encode)
+    
+    def _encode_token(self, to_encode: Dict[str, Any]) -> str:
+        """Encode and sign a JWT payload"""
+        return _encode_jwt(to_encode, self.secret_key, self.algorithm)
     
     def decode_token(self, token: str) -> Optional[Dict[str, Any]]:
         """Decode and verify a JWT token"""
@@ -116,8 +174,9 @@ class AuthService:
             logger.error(f"Token decode error: {e}")
             return None
     
-    def register_user(self, session: Session, user_data: UserRegisterRequest) -> tuple[Optional[User], Optional[str]]:
-        """Register a new user"""
+    def register_user(self, session: Session, user_data: UserRegisterRequest,
+                      password_hash: Optional[str] = None) -> tuple[Optional[User], Optional[str]]:
+        """Register a new user (password_hash may be precomputed by the caller)"""
         try:
             # Check if user already exists
             existing_user = session.query(User).filter(
@@ -134,7 +193,7 @@ class AuthService:
             user = User(
                 email=user_data.email,
                 username=user_data.username,
-                password_hash=self.hash_password(user_data.password),
+                password_hash=password_hash or self.hash_password(user_data.password),
                 first_name=user_data.first_name,
                 last_name=user_data.last_name,
                 is_active=True
@@ -143,7 +202,7 @@ class AuthService:
             session.add(user)
             session.flush()
             
-            logger.info(f"User registered successfully: {user.email}")
+            logger.debug("User registered successfully: %s", user.email)
             return user, None
             
         except IntegrityError as e:
@@ -155,74 +214,91 @@ class AuthService:
             logger.error(f"Registration error: {e}")
             return None, "Registration failed"
     
+    async def register_user_async(self, session: AsyncSession, user_data: UserRegisterRequest) -> tuple[Optional[User], Optional[str]]:
+        """Register a new user, hashing the password on the bcrypt worker pool"""
+        password_hash = await self.hash_password_async(user_data.password)
+        return await session.run_sync(self.register_user, user_data, password_hash)
+    
     def authenticate_user(self, session: Session, email: str, password: str) -> tuple[Optional[User], Optional[str]]:
         """Authenticate a user with email and password"""
         try:
-            user = session.query(User).filter(User.email == email).first()
-            
-            if not user:
-                return None, "Invalid email or password"
-            
-            if not user.is_active:
-                return None, "Account is deactivated"
+            user, error = self._get_login_user(session, email)
+            if error:
+                return None, error
             
-            # Check for account lockout
-            if user.failed_login_attempts >= self.max_failed_attempts:
-                if user.last_activity and (
-                    datetime.now() - user.last_activity
-                ).total_seconds() < self.account_lockout_duration:
-                    return None, "Account is temporarily locked due to failed login attempts"
-                else:
-                    # Reset failed attempts after lockout period
-                    user.failed_login_attempts = 0
+            return self._complete_login(session, user, self.verify_password(password, user.password_hash))
             
-            if not self.verify_password(password, user.password_hash):
-                user.failed_login_attempts += 1
-                session.commit()
-                return None, "Invalid email or password"
+        except Exception as e:
+            logger.error(f"Authentication error: {e}")
+            return None, "Authentication failed"
+    
+    async def authenticate_user_async(self, session: AsyncSession, email: str, password: str) -> tuple[Optional[User], Optional[str]]:
+        """Authenticate a user, verifying the password on the bcrypt worker pool"""
+        try:
+            user, error = await session.run_sync(self._get_login_user, email)
+            if error:
+                return None, error
             
-            # Reset failed attempts on successful login
-            user.failed_login_attempts = 0
-            user.last_login = datetime.now()
-            session.commit()
-            
-            logger.info(f"User authenticated successfully: {user.email}")
-            return user, None
+            password_valid = await self.verify_password_async(password, user.password_hash)
+            return await session.run_sync(self._complete_login, user, password_valid)
             
         except Exception as e:
             logger.error(f"Authentication error: {e}")
             return None, "Authentication failed"
     
+    def _get_login_user(self, session: Session, email: str) -> tuple[Optional[User], Optional[str]]:
+        """Look up a user for login and apply active/lockout checks"""
+        user = session.query(User).filter(User.email == email).first()
+        
+        if not user:
+            return None, "Invalid email or password"
+        
+        if not user.is_active:
+            return None, "Account is deactivated"
+        
+        # Check for account lockout
+        if user.failed_login_attempts >= self.max_failed_attempts:
+            if user.last_activity and (
+                _utcnow() - user.last_activity
+            ).total_seconds() < self.account_lockout_duration:
+                return None, "Account is temporarily locked due to failed login attempts"
+            else:
+                # Reset failed attempts after lockout period
+                user.failed_login_attempts = 0
+        
+        return user, None
+    
+    def _complete_login(self, session: Session, user: User, password_valid: bool) -> tuple[Optional[User], Optional[str]]:
+        """Record the outcome of a password check for a login attempt"""
+        if not password_valid:
+            user.failed_login_attempts += 1
+            session.flush()
+            return None, "Invalid email or password"
+        
+        # Reset failed attempts on successful login
+        user.failed_login_attempts = 0
+        user.last_login = _utcnow()
+        session.flush()
+        
+        logger.debug("User authenticated successfully: %s", user.email)
+        return user, None
+    
     def create_access_token(self, user: User) -> TokenResponse:
         """Create an access token for a user"""
-        token_data = {
-            "sub": user.id,
-            "email": user.email,
-            "username": user.username,
-            "type": "access"
-        }
-        
-        expires_delta = timedelta(minutes=self.access_token_expire_minutes)
-        access_token = self.create_token(token_data, expires_delta)
+        now = time.time()
+        access_token, expires_at = _sign_access_token(
+            self.secret_key, self.algorithm, self.access_token_expire_minutes * 60,
+            user.id, user.email, user.username, int(now // 60)
+        )
+        expires_in = expires_at - int(now)
         
         # Create user response
-        user_response = UserResponse(
-            id=user.id,
-            email=user.email,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            full_name=user.full_name,
-            is_active=user.is_active,
-            created_at=user.created_at,
-            last_activity=user.last_activity,
-            last_login=user.last_login
-        )
+        user_response = UserResponse.model_validate(user)
         
         return TokenResponse(
             access_token=access_token,
             token_type="bearer",
-            expires_in=self.access_token_expire_minutes * 60,
+            expires_in=expires_in,
             user=user_response
         )
     
@@ -237,13 +313,13 @@ class AuthService:
             if not user_id:
                 return None
             
-            user = session.query(User).filter(User.id == user_id).first()
+            user = session.get(User, user_id)
             if not user or not user.is_active:
                 return None
             
             # Update last activity
-            user.last_activity = datetime.now()
-            session.commit()
+            user.last_activity = _utcnow()
+            session.flush()
             
             return user
             
@@ -261,9 +337,28 @@ class AuthService:
                 return False, "New password must be different from current password"
             
             user.password_hash = self.hash_password(request.new_password)
-            session.commit()
+            session.flush()
             
-            logger.info(f"Password changed for user: {user.email}")
+            logger.debug("Password changed for user: %s", user.email)
+            return True, None
+            
+        except Exception as e:
+            logger.error(f"Password change error: {e}")
+            return False, "Failed to change password"
+    
+    async def change_password_async(self, session: AsyncSession, user: User, request: PasswordChangeRequest) -> tuple[bool, Optional[str]]:
+        """Change user password, running bcrypt on the worker pool"""
+        try:
+            if not await self.verify_password_async(request.current_password, user.password_hash):
+                return False, "Current password is incorrect"
+            
+            if request.current_password == request.new_password:
+                return False, "New password must be different from current password"
+            
+            user.password_hash = await self.hash_password_async(request.new_password)
+            await session.flush()
+            
+            logger.debug("Password changed for user: %s", user.email)
             return True, None
             
         except Exception as e:
@@ -280,10 +375,10 @@ class AuthService:
             # Generate reset token
             reset_token = secrets.token_urlsafe(32)
             user.password_reset_token = reset_token
-            user.password_reset_expires = datetime.now() + timedelta(hours=1)  # 1 hour expiry
-            session.commit()
+            user.password_reset_expires = _utcnow() + timedelta(hours=1)  # 1 hour expiry
+            session.flush()
             
-            logger.info(f"Password reset token generated for user: {user.email}")
+            logger.debug("Password reset token generated for user: %s", user.email)
             return True, reset_token
             
         except Exception as e:
@@ -293,25 +388,52 @@ class AuthService:
     def reset_password(self, session: Session, token: str, new_password: str) -> tuple[bool, Optional[str]]:
         """Reset password using reset token"""
         try:
-            user = session.query(User).filter(User.password_reset_token == token).first()
-            if not user:
-                return False, "Invalid reset token"
+            user, error = self._get_reset_user(session, token)
+            if error:
+                return False, error
             
-            if not user.password_reset_expires or datetime.now() > user.password_reset_expires:
-                return False, "Reset token has expired"
+            self._apply_password_reset(session, user, self.hash_password(new_password))
+            return True, None
             
-            user.password_hash = self.hash_password(new_password)
-            user.password_reset_token = None
-            user.password_reset_expires = None
-            user.failed_login_attempts = 0  # Reset failed attempts
-            session.commit()
+        except Exception as e:
+            logger.error(f"Password reset error: {e}")
+            return False, "Failed to reset password"
+    
+    async def reset_password_async(self, session: AsyncSession, token: str, new_password: str) -> tuple[bool, Optional[str]]:
+        """Reset password using reset token, hashing on the bcrypt worker pool"""
+        try:
+            user, error = await session.run_sync(self._get_reset_user, token)
+            if error:
+                return False, error
             
-            logger.info(f"Password reset completed for user: {user.email}")
+            password_hash = await self.hash_password_async(new_password)
+            await session.run_sync(self._apply_password_reset, user, password_hash)
             return True, None
             
         except Exception as e:
             logger.error(f"Password reset error: {e}")
             return False, "Failed to reset password"
+    
+    def _get_reset_user(self, session: Session, token: str) -> tuple[Optional[User], Optional[str]]:
+        """Look up the user for a reset token and check it has not expired"""
+        user = session.query(User).filter(User.password_reset_token == token).first()
+        if not user:
+            return None, "Invalid reset token"
+        
+        if not user.password_reset_expires or _utcnow() > user.password_reset_expires:
+            return None, "Reset token has expired"
+        
+        return user, None
+    
+    def _apply_password_reset(self, session: Session, user: User, password_hash: str):
+        """Store the new password hash and clear the reset token"""
+        user.password_hash = password_hash
+        user.password_reset_token = None
+        user.password_reset_expires = None
+        user.failed_login_attempts = 0  # Reset failed attempts
+        session.flush()
+        
+        logger.debug("Password reset completed for user: %s", user.email)
 
 # Global auth service instance
 auth_service = AuthService()
@@ -4,10 +4,11 @@ Authentication middleware and dependencies for FastAPI
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import logging
 
-from backend.core.database import get_db_session
+from backend.core.database import get_db_session, get_async_db_session
 from backend.auth.auth import auth_service
 from backend.models.models import User
 
@@ -28,9 +29,9 @@ class AuthMiddleware:
         return response
 
 # Dependency functions
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ) -> User:
     """
     FastAPI dependency to get current authenticated user
@@ -38,7 +39,7 @@ def get_current_user(
     """
     try:
         token = credentials.credentials
-        user = auth_service.get_current_user(session, token)
+        user = await session.run_sync(auth_service.get_current_user, token)
         
         if not user:
             raise HTTPException(
@@ -12,15 +12,45 @@ from backend.utils.tools import (
     financial_search_tool, investment_search_tool, risk_search_tool, industry_search_tool
 )
 from backend.utils.llm_observability import track_crewai_call, llm_observability
+from backend.utils.redis_cache import redis_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# TTL for cached LLM completions (same default as cache_llm_result)
+LLM_RESPONSE_CACHE_TTL = int(os.getenv("LLM_RESPONSE_CACHE_TTL", "7200"))
+
+class CachedLLM(LLM):
+    """
+    LLM whose completions are cached in Redis, content-addressed by model and messages
+    
+    The messages already carry the agent role/backstory, the rendered task description
+    and the outputs of context tasks, so a re-run of the same query on the same document
+    (e.g. a UI refresh) is answered from the cache without calling the model. Keys live
+    under the "llm:<model>" tag, so invalidate_llm_cache() clears them.
+    """
+    
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        # Native function calling executes tools inside the call; never replay those
+        if available_functions:
+            return super().call(messages, tools, callbacks, available_functions, **kwargs)
+        
+        cache_key = redis_cache._generate_key(f"llm:{self.model}", messages, tools)
+        cached = redis_cache.get(cache_key)
+        if cached is not None:
+            logger.debug("LLM cache HIT for %s", self.model)
+            return cached
+        
+        response = super().call(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str) and response:
+            redis_cache.set(cache_key, response, LLM_RESPONSE_CACHE_TTL)
+        return response
+
 @track_crewai_call(model="nvidia_nim/meta/llama-3.1-405b-instruct")
 def create_enhanced_llm():
     try:
         # Try NVIDIA NIM configuration first
-        llm = LLM(
+        llm = CachedLLM(
             model="nvidia_nim/meta/llama-3.1-405b-instruct",
             base_url="https://integrate.api.nvidia.com/v1",
             api_key=os.getenv("NVIDIA_NIM_API_KEY"),
@@ -32,7 +62,7 @@ def create_enhanced_llm():
         print(f"⚠️ NVIDIA NIM configuration issue: {e}")
         # Fallback to OpenAI compatible configuration
         try:
-            llm = LLM(
+            llm = CachedLLM(
                 model="gpt-3.5-turbo",
                 api_key=os.getenv("OPENAI_API_KEY"),
                 temperature=0.2,
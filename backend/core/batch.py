@@ -0,0 +1,114 @@
+"""
+Batch Analysis
+Offline analysis of many documents through the OpenAI Batch API (half the token cost,
+results within 24 hours). Interactive /analyze requests keep using the synchronous crews.
+"""
+import os
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from openai import OpenAI
+
+from backend.core.task import comprehensive_financial_analysis
+from backend.utils.tools import financial_document_tool
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+BATCH_MODEL = os.getenv("BATCH_LLM_MODEL", "gpt-3.5-turbo")
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+
+def build_batch_requests(pairs: List[Tuple[str, str]]) -> Tuple[List[dict], Dict[str, Tuple[str, str]]]:
+    """
+    Render one self-contained chat request per (file_path, query) pair
+
+    Batch requests cannot call tools, so the extracted document text is inlined in the
+    prompt instead of being read by the agent; each line carries only its own document.
+
+    Args:
+        pairs: (file_path, query) tuples to analyze
+
+    Returns:
+        (batch request lines, custom_id -> (file_path, query))
+    """
+    task = comprehensive_financial_analysis
+    system_prompt = f"You are a {task.agent.role}. {task.agent.backstory.strip()}"
+
+    requests = []
+    index = {}
+    for position, (file_path, query) in enumerate(pairs):
+        document_text = financial_document_tool._run(file_path)
+        if document_text.startswith("Error"):
+            logger.warning(f"Skipping {file_path} in batch: {document_text}")
+            continue
+
+        custom_id = f"analysis-{position}"
+        prompt = (
+            task.description.format(file_path=file_path, query=query).strip()
+            + "\n\nExpected output:\n" + task.expected_output.strip()
+            + "\n\nDocument text:\n" + document_text
+        )
+        requests.append({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": BATCH_MODEL,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.2
+            }
+        })
+        index[custom_id] = (file_path, query)
+
+    return requests, index
+
+def submit_batch(pairs: List[Tuple[str, str]], client: Optional[OpenAI] = None) -> Tuple[Optional[str], Dict[str, Tuple[str, str]]]:
+    """
+    Upload the rendered requests as JSONL and create a batch job
+
+    Returns:
+        (batch id or None when nothing was submitted, custom_id -> (file_path, query))
+    """
+    requests, index = build_batch_requests(pairs)
+    if not requests:
+        return None, index
+
+    client = client or OpenAI()
+    payload = b"\n".join(orjson.dumps(request) for request in requests)
+    batch_file = client.files.create(file=("analysis_batch.jsonl", payload), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW
+    )
+    logger.info(f"Submitted analysis batch {batch.id} with {len(requests)} documents")
+    return batch.id, index
+
+def fetch_batch_results(batch_id: str, client: Optional[OpenAI] = None) -> Optional[Dict[str, str]]:
+    """
+    Collect the analyses of a finished batch
+
+    Returns:
+        custom_id -> analysis text (or an error message), or None while the batch is still running
+    """
+    client = client or OpenAI()
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        logger.info(f"Analysis batch {batch_id} is {batch.status}")
+        return None
+
+    results = {}
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).content.splitlines():
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") == 200:
+                results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                results[record["custom_id"]] = f"Analysis failed: {record.get('error') or response.get('body')}"
+    return results
@@ -2,19 +2,49 @@
 Database connection and session management for Financial Document Analyzer
 """
 import os
+import time
 import logging
-from sqlalchemy import create_engine, event, text
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.pool import StaticPool
 from contextlib import contextmanager
 from typing import Generator
 import sqlite3
 
-from backend.models.models import Base, User, Document, Analysis, AnalysisHistory
+from backend.models.models import Base, User, Document, Analysis, AnalysisHistory, _utcnow
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Backfills users.full_name with the same rules as compose_full_name (plain SQL that
+# SQLite and PostgreSQL both accept)
+FULL_NAME_BACKFILL = """
+    UPDATE users SET full_name = CASE
+        WHEN first_name <> '' AND last_name <> '' THEN first_name || ' ' || last_name
+        WHEN first_name <> '' THEN first_name
+        WHEN username <> '' THEN username
+        ELSE 'User ' || substr(id, 1, 8)
+    END
+"""
+
+def add_user_full_name_column(engine) -> int:
+    """
+    Add and backfill users.full_name on databases created before the column existed
+    
+    Returns:
+        Number of users backfilled (0 when the column was already there)
+    """
+    inspector = inspect(engine)
+    if "users" not in inspector.get_table_names():
+        return 0
+    if any(column["name"] == "full_name" for column in inspector.get_columns("users")):
+        return 0
+    
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN full_name VARCHAR"))
+        return conn.execute(text(FULL_NAME_BACKFILL)).rowcount
+
 class DatabaseManager:
     """Database connection and session management"""
     
@@ -22,7 +52,14 @@ class DatabaseManager:
         self.database_url = database_url or self._get_database_url()
         self.engine = None
         self.SessionLocal = None
+        self.async_engine = None
+        self.AsyncSessionLocal = None
+        # Short-lived cache for get_database_info(); the data rarely changes between probes
+        self.info_cache_ttl = float(os.getenv('DATABASE_INFO_CACHE_TTL', 5))
+        self._info_cache = None
+        self._info_cache_expires = 0.0
         self._initialize_engine()
+        self._initialize_async_engine()
         
     def _get_database_url(self) -> str:
         """Get database URL from environment or use default SQLite"""
@@ -65,9 +102,7 @@ class DatabaseManager:
             # PostgreSQL or other database configuration
             self.engine = create_engine(
                 self.database_url,
-                pool_size=10,
-                max_overflow=20,
-                pool_pre_ping=True,
+                **self._pool_settings(),
                 echo=os.getenv('DATABASE_DEBUG', '').lower() == 'true'
             )
         
@@ -78,6 +113,59 @@ class DatabaseManager:
         
         logger.info(f"Database engine initialized with URL: {self._mask_db_url(self.database_url)}")
     
+    def _pool_settings(self) -> dict:
+        """Connection pool settings for server databases, sized for concurrent requests plus background analyses"""
+        return {
+            "pool_size": int(os.getenv('DATABASE_POOL_SIZE', 20)),
+            "max_overflow": int(os.getenv('DATABASE_MAX_OVERFLOW', 30)),
+            "pool_timeout": float(os.getenv('DATABASE_POOL_TIMEOUT', 5)),  # Fail fast instead of queueing 30s
+            "pool_recycle": int(os.getenv('DATABASE_POOL_RECYCLE', 1800)),  # Drop connections before server idle timeouts
+            "pool_pre_ping": True,
+        }
+    
+    def _get_async_database_url(self) -> str:
+        """Get the async driver URL (aiosqlite/asyncpg) matching the sync database URL"""
+        async_url = os.getenv('ASYNC_DATABASE_URL')
+        if async_url:
+            return async_url
+        
+        if self.database_url.startswith('sqlite:'):
+            return self.database_url.replace('sqlite:', 'sqlite+aiosqlite:', 1)
+        if self.database_url.startswith(('postgresql:', 'postgres:')):
+            return 'postgresql+asyncpg:' + self.database_url.split(':', 1)[1]
+        return self.database_url
+    
+    def _initialize_async_engine(self):
+        """Initialize the async engine used by non-blocking (async def) request handlers"""
+        async_url = self._get_async_database_url()
+        
+        if async_url.startswith('sqlite'):
+            self.async_engine = create_async_engine(
+                async_url,
+                connect_args={"timeout": 20},
+                echo=os.getenv('DATABASE_DEBUG', '').lower() == 'true'
+            )
+            
+            @event.listens_for(self.async_engine.sync_engine, "connect")
+            def set_async_sqlite_pragma(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA foreign_keys=ON")
+                cursor.execute("PRAGMA cache_size=-64000")  # 64MB cache
+                cursor.close()
+        else:
+            self.async_engine = create_async_engine(
+                async_url,
+                **self._pool_settings(),
+                echo=os.getenv('DATABASE_DEBUG', '').lower() == 'true'
+            )
+        
+        # Keep loaded attributes after commit so handlers don't trigger implicit (sync) lazy loads
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine, expire_on_commit=False, autoflush=False
+        )
+        
+        logger.info(f"Async database engine initialized with URL: {self._mask_db_url(async_url)}")
+    
     def _mask_db_url(self, url: str) -> str:
         """Mask sensitive information in database URL for logging"""
         if '://' in url:
@@ -98,6 +186,16 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
             raise
+        
+        # create_all never alters existing tables; add the one column the models
+        # gained since, so older databases keep working before the migration script runs
+        try:
+            backfilled = add_user_full_name_column(self.engine)
+            if backfilled:
+                logger.info(f"Added users.full_name and backfilled {backfilled} users")
+        except Exception as e:
+            # e.g. another worker added the column concurrently
+            logger.warning(f"Could not add users.full_name: {e}")
     
     def drop_tables(self):
         """Drop all database tables (use with caution!)"""
@@ -112,6 +210,10 @@ class DatabaseManager:
         """Get a database session"""
         return self.SessionLocal()
     
+    def get_async_session(self) -> AsyncSession:
+        """Get an async database session"""
+        return self.AsyncSessionLocal()
+    
     @contextmanager
     def session_scope(self) -> Generator:
         """Provide a transactional scope around a series of operations"""
@@ -138,7 +240,19 @@ class DatabaseManager:
             return False
     
     def get_database_info(self) -> dict:
-        """Get database information for monitoring"""
+        """Get database information for monitoring (cached for a few seconds)"""
+        now = time.monotonic()
+        if self._info_cache is not None and now < self._info_cache_expires:
+            return self._info_cache
+        
+        info = self._fetch_database_info()
+        if "error" not in info:
+            self._info_cache = info
+            self._info_cache_expires = now + self.info_cache_ttl
+        return info
+    
+    def _fetch_database_info(self) -> dict:
+        """Query the database for monitoring information"""
         try:
             with self.session_scope() as session:
                 if self.database_url.startswith('sqlite'):
@@ -188,6 +302,23 @@ def get_db_session():
     finally:
         session.close()
 
+async def get_async_db_session():
+    """Dependency function for FastAPI to get an async database session.
+    
+    The session is committed once when the request handler succeeds and rolled
+    back if it raises, so handlers only need to flush.
+    """
+    if not db_manager:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    
+    async with db_manager.get_async_session() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
 def get_database_manager() -> DatabaseManager:
     """Get the global database manager"""
     if not db_manager:
@@ -213,7 +344,7 @@ def update_user_activity(user_id: str):
     with db_manager.session_scope() as session:
         user = session.query(User).filter(User.id == user_id).first()
         if user:
-            user.last_activity = datetime.utcnow()
+            user.last_activity = _utcnow()
             session.flush()
 
 # Database initialization check
@@ -226,6 +226,3 @@ comprehensive_financial_analysis = Task(
     tools=[financial_document_tool, investment_analysis_tool, risk_assessment_tool, search_tool, industry_search_tool],
     async_execution=False
 )
-
-# Legacy compatibility
-legacy_comprehensive_analysis = comprehensive_financial_analysis
@@ -1,172 +1,278 @@
 """
 Database models for the Financial Document Analyzer
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, Boolean, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from datetime import datetime
-from typing import Optional
+from sqlalchemy import Integer, String, DateTime, Text, Float, Boolean, ForeignKey, Index, LargeBinary, TypeDecorator, text, event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, validates
+from datetime import datetime, timezone
+from typing import List, Optional
+import os
+import time
 import uuid
+import threading
+
+class Base(DeclarativeBase):
+    """Declarative base shared by all ORM models"""
+
+# Loader strategy: many-to-one relationships are lazy="raise_on_sql", so touching one
+# that is neither eager-loaded (selectinload/joinedload) nor already in the identity
+# map raises instead of silently issuing a query per row. Collections keep lazy loading
+# because the delete-orphan cascades need to load them.
+
+# Random bytes for uuid7() are drawn from os.urandom in blocks of UUID_ENTROPY_BATCH ids
+# (one syscall per batch instead of per row); the buffer is dropped in forked workers
+# so no two processes hand out the same random tail
+UUID_ENTROPY_BATCH = 256
+_uuid_entropy = b""
+_uuid_entropy_offset = 0
+_uuid_lock = threading.Lock()
+
+def _reset_uuid_entropy():
+    global _uuid_entropy, _uuid_entropy_offset
+    _uuid_entropy, _uuid_entropy_offset = b"", 0
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_uuid_entropy)
+
+def uuid7() -> str:
+    """Time-ordered UUID (RFC 9562 version 7) string, so new rows append to the PK index"""
+    global _uuid_entropy, _uuid_entropy_offset
+    with _uuid_lock:
+        if _uuid_entropy_offset >= len(_uuid_entropy):
+            _uuid_entropy, _uuid_entropy_offset = os.urandom(10 * UUID_ENTROPY_BATCH), 0
+        rand = _uuid_entropy[_uuid_entropy_offset:_uuid_entropy_offset + 10]
+        _uuid_entropy_offset += 10
+    
+    raw = bytearray((time.time_ns() // 1_000_000).to_bytes(6, "big") + rand)
+    raw[6] = (raw[6] & 0x0F) | 0x70  # version 7
+    raw[8] = (raw[8] & 0x3F) | 0x80  # RFC 4122 variant
+    # Format the hex directly rather than building a uuid.UUID just to str() it
+    h = raw.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def _utcnow() -> datetime:
+    """Current time as a timezone-aware UTC datetime (default/onupdate for the timestamp columns)"""
+    return datetime.now(timezone.utc)
+
+class UTCDateTime(TypeDecorator):
+    """DateTime(timezone=True) that always reads back aware UTC datetimes
+    
+    SQLite keeps no offset, so values are stored as naive UTC there and tagged on read;
+    naive values from before this type are taken to be UTC as well.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+            if dialect.name == "sqlite":
+                value = value.replace(tzinfo=None)
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
 
-Base = declarative_base()
+class Sha256Digest(TypeDecorator):
+    """Raw 32-byte SHA-256 digest; hex text left by databases not yet migrated is decoded on read"""
+    impl = LargeBinary(32)
+    cache_ok = True
+    
+    def process_result_value(self, value, dialect):
+        return bytes.fromhex(value) if isinstance(value, str) else value
+
+def compose_full_name(first_name: Optional[str], last_name: Optional[str], username: Optional[str], user_id: Optional[str]) -> Optional[str]:
+    """Display name: first and last name, first name, username, then the id prefix"""
+    if first_name and last_name:
+        return f"{first_name} {last_name}"
+    elif first_name:
+        return first_name
+    elif username:
+        return username
+    elif user_id:
+        return f"User {user_id[:8]}"
+    return None
 
 class User(Base):
     """Enhanced User model for authentication and session tracking"""
     __tablename__ = "users"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid7)
     
     # Authentication fields
-    email = Column(String, unique=True, nullable=True, index=True)  # Nullable for backward compatibility
-    username = Column(String, unique=True, nullable=True, index=True)  # Nullable for backward compatibility
-    password_hash = Column(String, nullable=True)  # Nullable for backward compatibility
-    is_active = Column(Boolean, default=True)
+    email: Mapped[Optional[str]] = mapped_column(String, unique=True, nullable=True, index=True)  # Nullable for backward compatibility
+    username: Mapped[Optional[str]] = mapped_column(String, unique=True, nullable=True, index=True)  # Nullable for backward compatibility
+    password_hash: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Nullable for backward compatibility
+    is_active: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
     
     # Original session-based fields (keeping for backward compatibility)
-    session_id = Column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
-    created_at = Column(DateTime, default=func.now())
-    last_activity = Column(DateTime, default=func.now(), onupdate=func.now())
-    ip_address = Column(String, nullable=True)
-    user_agent = Column(Text, nullable=True)
+    session_id: Mapped[str] = mapped_column(String, unique=True, nullable=False, default=lambda: str(uuid.uuid4()))
+    created_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, default=_utcnow)
+    last_activity: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, default=_utcnow, onupdate=_utcnow)
+    ip_address: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    user_agent: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
     # Additional user profile fields
-    first_name = Column(String, nullable=True)
-    last_name = Column(String, nullable=True)
+    first_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    last_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # Display name, kept in step with the fields above at write time (see _refresh_full_name)
+    full_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
     # Security and tracking
-    failed_login_attempts = Column(Integer, default=0)
-    last_login = Column(DateTime, nullable=True)
-    password_reset_token = Column(String, nullable=True)
-    password_reset_expires = Column(DateTime, nullable=True)
+    failed_login_attempts: Mapped[Optional[int]] = mapped_column(Integer, default=0)
+    last_login: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, nullable=True)
+    password_reset_token: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    password_reset_expires: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, nullable=True)
     
     # Relationships
-    documents = relationship("Document", back_populates="user", cascade="all, delete-orphan")
-    analyses = relationship("Analysis", back_populates="user", cascade="all, delete-orphan")
+    documents: Mapped[List["Document"]] = relationship("Document", back_populates="user", cascade="all, delete-orphan")
+    analyses: Mapped[List["Analysis"]] = relationship("Analysis", back_populates="user", cascade="all, delete-orphan")
     
-    @property
-    def full_name(self):
-        """Return full name if available"""
-        if self.first_name and self.last_name:
-            return f"{self.first_name} {self.last_name}"
-        elif self.first_name:
-            return self.first_name
-        elif self.username:
-            return self.username
-        else:
-            return f"User {self.id[:8]}"
+    @validates("first_name", "last_name", "username")
+    def _refresh_full_name(self, key, value):
+        """Recompute full_name whenever one of the name fields is assigned"""
+        names = {"first_name": self.first_name, "last_name": self.last_name, "username": self.username}
+        names[key] = value
+        self.full_name = compose_full_name(user_id=self.id, **names)
+        return value
     
     @property
     def is_authenticated_user(self):
         """Check if this is a properly authenticated user (not just a session)"""
         return self.email is not None and self.password_hash is not None
 
+@event.listens_for(User, "before_insert")
+def _fill_full_name(mapper, connection, target):
+    """Session-only users never set a name field; give them the id-based name on insert"""
+    if target.full_name is None:
+        if target.id is None:
+            target.id = uuid7()
+        target.full_name = compose_full_name(target.first_name, target.last_name, target.username, target.id)
+
 class Document(Base):
     """Document metadata model"""
     __tablename__ = "documents"
+    __table_args__ = (
+        # Serves the per-user document list (WHERE user_id = ? ORDER BY upload_timestamp DESC)
+        Index("ix_documents_user_uploaded", "user_id", "upload_timestamp"),
+        # Duplicate detection (WHERE file_hash = ?); partial so rows without a hash stay out of it
+        Index(
+            "ix_documents_file_hash", "file_hash",
+            sqlite_where=text("file_hash IS NOT NULL"),
+            postgresql_where=text("file_hash IS NOT NULL")
+        ),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    original_filename = Column(String, nullable=False)
-    stored_filename = Column(String, nullable=False)
-    file_path = Column(String, nullable=True)  # Optional: for persistent storage
-    file_size = Column(Integer, nullable=False)  # Size in bytes
-    file_type = Column(String, nullable=False, default="PDF")
-    mime_type = Column(String, nullable=False, default="application/pdf")
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid7)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), nullable=False)
+    original_filename: Mapped[str] = mapped_column(String, nullable=False)
+    stored_filename: Mapped[str] = mapped_column(String, nullable=False)
+    file_path: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # Optional: for persistent storage
+    file_size: Mapped[int] = mapped_column(Integer, nullable=False)  # Size in bytes
+    file_type: Mapped[str] = mapped_column(String, nullable=False, default="PDF")
+    mime_type: Mapped[str] = mapped_column(String, nullable=False, default="application/pdf")
     
     # File metadata
-    upload_timestamp = Column(DateTime, default=func.now())
-    file_hash = Column(String, nullable=True)  # For duplicate detection
-    is_processed = Column(Boolean, default=False)
-    is_stored_permanently = Column(Boolean, default=False)
+    upload_timestamp: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, default=_utcnow)
+    file_hash: Mapped[Optional[bytes]] = mapped_column(Sha256Digest, nullable=True)  # Raw SHA-256 digest, for duplicate detection
+    is_processed: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
+    is_stored_permanently: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
     
     # Relationships
-    user = relationship("User", back_populates="documents")
-    analyses = relationship("Analysis", back_populates="document", cascade="all, delete-orphan")
+    user: Mapped["User"] = relationship("User", back_populates="documents", lazy="raise_on_sql")
+    analyses: Mapped[List["Analysis"]] = relationship("Analysis", back_populates="document", cascade="all, delete-orphan")
 
 class Analysis(Base):
     """Analysis results model"""
     __tablename__ = "analyses"
+    __table_args__ = (
+        # Serves the per-user history (WHERE user_id = ? ORDER BY started_at DESC)
+        Index("ix_analyses_user_started", "user_id", "started_at"),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    document_id = Column(String, ForeignKey("documents.id"), nullable=False)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid7)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), nullable=False)
+    document_id: Mapped[str] = mapped_column(String, ForeignKey("documents.id"), nullable=False, index=True)
     
     # Analysis request info
-    query = Column(Text, nullable=False)
-    analysis_type = Column(String, nullable=False, default="comprehensive")
+    query: Mapped[str] = mapped_column(Text, nullable=False)
+    analysis_type: Mapped[str] = mapped_column(String, nullable=False, default="comprehensive")
     
     # Analysis results
-    result = Column(Text, nullable=False)  # Main analysis result
-    summary = Column(Text, nullable=True)  # Optional summary
+    result: Mapped[str] = mapped_column(Text, nullable=False)  # Main analysis result
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Optional summary
     
     # Analysis metadata
-    started_at = Column(DateTime, default=func.now())
-    completed_at = Column(DateTime, nullable=True)
-    processing_time_seconds = Column(Float, nullable=True)
-    status = Column(String, nullable=False, default="pending")  # pending, processing, completed, failed
-    error_message = Column(Text, nullable=True)
+    started_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, default=_utcnow)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, nullable=True)
+    processing_time_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="pending", index=True)  # pending, processing, completed, failed
+    error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     
     # Analysis metrics/confidence
-    confidence_score = Column(Float, nullable=True)
-    key_insights_count = Column(Integer, nullable=True)
+    confidence_score: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    key_insights_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     
     # Relationships
-    user = relationship("User", back_populates="analyses")
-    document = relationship("Document", back_populates="analyses")
+    user: Mapped["User"] = relationship("User", back_populates="analyses", lazy="raise_on_sql")
+    document: Mapped["Document"] = relationship("Document", back_populates="analyses", lazy="raise_on_sql")
 
 class AnalysisHistory(Base):
     """Historical tracking and audit log"""
     __tablename__ = "analysis_history"
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    analysis_id = Column(String, ForeignKey("analyses.id"), nullable=False)
-    action = Column(String, nullable=False)  # created, updated, deleted, viewed
-    timestamp = Column(DateTime, default=func.now())
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
-    details = Column(Text, nullable=True)  # JSON string with additional details
-    ip_address = Column(String, nullable=True)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=uuid7)
+    analysis_id: Mapped[str] = mapped_column(String, ForeignKey("analyses.id"), nullable=False, index=True)
+    action: Mapped[str] = mapped_column(String, nullable=False)  # created, updated, deleted, viewed
+    timestamp: Mapped[Optional[datetime]] = mapped_column(UTCDateTime, default=_utcnow)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), nullable=False, index=True)
+    details: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON string with additional details
+    ip_address: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
     # Relationships
-    analysis = relationship("Analysis")
-    user = relationship("User")
+    analysis: Mapped["Analysis"] = relationship("Analysis", lazy="raise_on_sql")
+    user: Mapped["User"] = relationship("User", lazy="raise_on_sql")
 
 # Pydantic models for API responses
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 from datetime import datetime
-from typing import List, Optional
+from typing import List
+
+# Shared by the *Response models: built from ORM objects, immutable once validated
+RESPONSE_MODEL_CONFIG = ConfigDict(from_attributes=True, frozen=True, extra="ignore")
 
 # Authentication models
 class UserRegisterRequest(BaseModel):
     email: str
     username: str
     password: str
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
+    first_name: str | None = None
+    last_name: str | None = None
 
 class UserLoginRequest(BaseModel):
     email: str
     password: str
 
 class UserResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     id: str
-    email: Optional[str] = None
-    username: Optional[str] = None
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    full_name: str
+    email: str | None = None
+    username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    full_name: str | None = None  # Materialized on the User row at write time
     is_active: bool
     created_at: datetime
     last_activity: datetime
-    last_login: Optional[datetime] = None
-    
-    class Config:
-        from_attributes = True
+    last_login: datetime | None = None
 
 class UserProfileUpdate(BaseModel):
-    first_name: Optional[str] = None
-    last_name: Optional[str] = None
-    email: Optional[str] = None
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
 
 class PasswordChangeRequest(BaseModel):
     current_password: str
@@ -180,6 +286,8 @@ class PasswordResetConfirm(BaseModel):
     new_password: str
 
 class TokenResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     access_token: str
     token_type: str = "bearer"
     expires_in: int
@@ -187,6 +295,8 @@ class TokenResponse(BaseModel):
 
 # Existing models (keeping for backward compatibility)
 class DocumentResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     id: str
     user_id: str
     original_filename: str
@@ -195,52 +305,66 @@ class DocumentResponse(BaseModel):
     upload_timestamp: datetime
     is_processed: bool
     is_stored_permanently: bool
-    stored_filename: Optional[str] = None
-    file_path: Optional[str] = None
-    mime_type: Optional[str] = None
-    file_hash: Optional[str] = None
+    stored_filename: str | None = None
+    file_path: str | None = None
+    mime_type: str | None = None
+    file_hash: str | None = None
     
-    class Config:
-        from_attributes = True
+    @field_validator("file_hash", mode="before")
+    @classmethod
+    def hex_file_hash(cls, value):
+        """The column stores the raw digest; the API keeps returning hex"""
+        return value.hex() if isinstance(value, bytes) else value
 
 class AnalysisResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     id: str
     user_id: str
     document_id: str
-    query: Optional[str] = None
+    query: str | None = None
     analysis_type: str = "comprehensive"
-    result: Optional[str] = None
-    summary: Optional[str] = None
-    started_at: Optional[datetime] = None
-    completed_at: Optional[datetime] = None
-    processing_time_seconds: Optional[float] = None
+    result: str | None = None
+    summary: str | None = None
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+    processing_time_seconds: float | None = None
     status: str = "pending"
-    confidence_score: Optional[float] = None
-    key_insights_count: Optional[int] = None
-    error_message: Optional[str] = None  # Add this field
+    confidence_score: float | None = None
+    key_insights_count: int | None = None
+    error_message: str | None = None  # Add this field
     
     # Include document info in response
-    document: Optional[DocumentResponse] = None
+    document: DocumentResponse | None = None
     
-    class Config:
-        from_attributes = True
+    @model_validator(mode="before")
+    @classmethod
+    def skip_unloaded_document(cls, data):
+        """Leave document unset for rows loaded without it and not in the identity map"""
+        if isinstance(data, Analysis):
+            try:
+                data.document
+            except InvalidRequestError:  # lazy="raise_on_sql" refused to query for it
+                return {name: getattr(data, name) for name in cls.model_fields if name != "document"}
+        return data
 
 class AnalysisHistoryResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     analyses: List[AnalysisResponse]
     total_count: int
     page: int
     page_size: int
     has_more: bool
-    
-    class Config:
-        from_attributes = True
 
 class CreateAnalysisRequest(BaseModel):
     query: str
     analysis_type: str = "comprehensive"
 
 class AnalysisStatusResponse(BaseModel):
+    model_config = RESPONSE_MODEL_CONFIG
+    
     status: str
     message: str
-    analysis_id: Optional[str] = None
-    progress_percentage: Optional[int] = None
+    analysis_id: str | None = None
+    progress_percentage: int | None = None
@@ -3,18 +3,17 @@ Database service layer for Financial Document Analyzer
 Provides CRUD operations and business logic for all models
 """
 import os
-import hashlib
 import logging
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, selectinload
 from sqlalchemy import and_, or_, desc, func
 from datetime import datetime, timedelta
 import logging
 from typing import List, Tuple, Optional
 
-from backend.models.models import User, Document, Analysis, AnalysisHistory
+from backend.models.models import User, Document, Analysis, AnalysisHistory, _utcnow
 from backend.models.models import DocumentResponse, AnalysisResponse, AnalysisHistoryResponse
 from backend.core.database import get_database_manager
 
@@ -23,6 +22,49 @@ from backend.utils.redis_cache import cache_result, cache_database_query
 
 logger = logging.getLogger(__name__)
 
+# Columns returned by the document list endpoints (the DocumentResponse fields);
+# listing selects these directly instead of building ORM objects per row
+DOCUMENT_LIST_COLUMNS = (
+    Document.id,
+    Document.user_id,
+    Document.original_filename,
+    Document.file_size,
+    Document.file_type,
+    Document.upload_timestamp,
+    Document.is_processed,
+    Document.is_stored_permanently,
+    Document.stored_filename,
+    Document.file_path,
+    Document.mime_type,
+    Document.file_hash,
+)
+
+def _fetch_page_with_total(query, count_column, offset: int, limit: int):
+    """
+    Fetch one ordered page and the total row count in a single statement
+    using COUNT(*) OVER (); returns (rows, total_count)
+    
+    Each row carries an extra trailing "total_count" column.
+    """
+    rows = query.add_columns(func.count().over().label("total_count"))\
+                .offset(offset)\
+                .limit(limit)\
+                .all()
+    if rows:
+        return rows, rows[0].total_count
+    
+    # Past the last page no row carries the total, so fall back to a plain COUNT
+    total_count = query.order_by(None).with_entities(func.count(count_column)).scalar() if offset else 0
+    return rows, total_count
+
+def _document_row_dict(row) -> dict:
+    """Convert a DOCUMENT_LIST_COLUMNS row (with total_count) to a response dict"""
+    document = row._asdict()
+    document.pop("total_count", None)
+    if document["file_hash"] is not None:
+        document["file_hash"] = document["file_hash"].hex()
+    return document
+
 class UserService:
     """Enhanced UserService with authentication support"""
     
@@ -69,7 +111,7 @@ class UserService:
         try:
             user = session.query(User).filter(User.id == user_id).first()
             if user:
-                user.last_activity = datetime.now()
+                user.last_activity = _utcnow()
                 session.flush()
                 return True
             return False
@@ -81,8 +123,8 @@ class UserService:
     def update_user_login_time(session: Session, user: User) -> bool:
         """Update user's last login time"""
         try:
-            user.last_login = datetime.now()
-            user.last_activity = datetime.now()
+            user.last_login = _utcnow()
+            user.last_activity = _utcnow()
             session.flush()
             return True
         except Exception as e:
@@ -151,7 +193,7 @@ class UserService:
     def cleanup_inactive_users(session: Session, days: int = 30) -> int:
         """Clean up users inactive for specified days"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=days)
+            cutoff_date = _utcnow() - timedelta(days=days)
             
             # Only cleanup session users (not authenticated users)
             inactive_users = session.query(User).filter(
@@ -205,15 +247,10 @@ class DocumentService:
         file_size: int,
         file_type: str = "PDF",
         mime_type: str = "application/pdf",
-        file_content: bytes = None
+        file_hash: bytes = None
     ) -> Document:
-        """Create a new document record"""
+        """Create a new document record (metadata and SHA-256 only; the file stays on disk)"""
         try:
-            # Calculate file hash if content provided
-            file_hash = None
-            if file_content:
-                file_hash = hashlib.sha256(file_content).hexdigest()
-            
             document = Document(
                 user_id=user_id,
                 original_filename=original_filename,
@@ -234,10 +271,9 @@ class DocumentService:
             raise
     
     @staticmethod
-    @cache_database_query(table="documents", ttl=1800)  # Cache for 30 minutes
     def get_document_by_id(session: Session, document_id: str) -> Optional[Document]:
-        """Get document by ID"""
-        return session.query(Document).filter(Document.id == document_id).first()
+        """Get document by ID (served from the session identity map when already loaded)"""
+        return session.get(Document, document_id)
     
     @staticmethod
     @cache_database_query(table="documents", ttl=600)  # Cache for 10 minutes
@@ -246,28 +282,25 @@ class DocumentService:
         user_id: str, 
         page: int = 1, 
         page_size: int = 10
-    ) -> Tuple[List[Document], int]:
-        """Get user's documents with pagination"""
+    ) -> Tuple[List[dict], int]:
+        """Get user's documents with pagination (rows as plain dicts)"""
         try:
             offset = (page - 1) * page_size
             
-            query = session.query(Document).filter(Document.user_id == user_id)
-            total_count = query.count()
-            
-            documents = query.order_by(desc(Document.upload_timestamp))\
-                           .offset(offset)\
-                           .limit(page_size)\
-                           .all()
+            query = session.query(*DOCUMENT_LIST_COLUMNS).filter(Document.user_id == user_id)
+            rows, total_count = _fetch_page_with_total(
+                query.order_by(desc(Document.upload_timestamp)), Document.id, offset, page_size
+            )
             
-            return documents, total_count
+            return [_document_row_dict(row) for row in rows], total_count
         except Exception as e:
             logger.error(f"Error getting user documents: {e}")
             return [], 0
     
     @staticmethod
     @cache_database_query(table="documents", ttl=1800)  # Cache for 30 minutes
-    def find_duplicate_documents(session: Session, file_hash: str) -> List[Document]:
-        """Find documents with the same hash"""
+    def find_duplicate_documents(session: Session, file_hash: bytes) -> List[Document]:
+        """Find documents with the same hash (raw SHA-256 digest)"""
         if not file_hash:
             return []
         return session.query(Document).filter(Document.file_hash == file_hash).all()
@@ -347,12 +380,12 @@ class DocumentService:
         search_term: str = None,
         page: int = 1, 
         page_size: int = 10
-    ) -> Tuple[List[Document], int]:
-        """Search user's documents with pagination"""
+    ) -> Tuple[List[dict], int]:
+        """Search user's documents with pagination (rows as plain dicts)"""
         try:
             offset = (page - 1) * page_size
             
-            query = session.query(Document).filter(Document.user_id == user_id)
+            query = session.query(*DOCUMENT_LIST_COLUMNS).filter(Document.user_id == user_id)
             
             # Apply search filter if provided
             if search_term:
@@ -361,14 +394,11 @@ class DocumentService:
                 )
                 query = query.filter(search_filter)
             
-            total_count = query.count()
-            
-            documents = query.order_by(desc(Document.upload_timestamp))\
-                           .offset(offset)\
-                           .limit(page_size)\
-                           .all()
+            rows, total_count = _fetch_page_with_total(
+                query.order_by(desc(Document.upload_timestamp)), Document.id, offset, page_size
+            )
             
-            return documents, total_count
+            return [_document_row_dict(row) for row in rows], total_count
         except Exception as e:
             logger.error(f"Error searching user documents: {e}")
             return [], 0
@@ -382,18 +412,21 @@ class AnalysisService:
         user_id: str,
         document_id: str,
         query: str,
-        analysis_type: str = "comprehensive"
+        analysis_type: str = "comprehensive",
+        status: str = "pending"
     ) -> Analysis:
-        """Create a new analysis record"""
+        """Create a new analysis record (pass status="processing" to insert it already started)"""
         try:
             analysis = Analysis(
                 user_id=user_id,
                 document_id=document_id,
                 query=query,
                 analysis_type=analysis_type,
-                status="pending",
+                status=status,
                 result=""  # Will be updated when processing completes
             )
+            if status == "processing":
+                analysis.started_at = _utcnow()
             
             session.add(analysis)
             session.flush()
@@ -407,11 +440,11 @@ class AnalysisService:
     def update_analysis_status(session: Session, analysis_id: str, status: str) -> bool:
         """Update analysis status"""
         try:
-            analysis = session.query(Analysis).filter(Analysis.id == analysis_id).first()
+            analysis = session.get(Analysis, analysis_id)
             if analysis:
                 analysis.status = status
                 if status == "processing":
-                    analysis.started_at = datetime.utcnow()
+                    analysis.started_at = _utcnow()
                 session.flush()
                 return True
             return False
@@ -434,8 +467,9 @@ class AnalysisService:
             if analysis:
                 analysis.result = result
                 analysis.summary = summary
-                analysis.completed_at = datetime.utcnow()
+                analysis.completed_at = _utcnow()
                 analysis.status = "completed"
+                analysis.error_message = None  # A late result replaces a recorded timeout
                 analysis.confidence_score = confidence_score
                 analysis.key_insights_count = key_insights_count
                 
@@ -478,7 +512,7 @@ class AnalysisService:
             if analysis:
                 analysis.status = "failed"
                 analysis.error_message = error_message
-                analysis.completed_at = datetime.utcnow()
+                analysis.completed_at = _utcnow()
                 session.flush()
                 logger.info(f"Failed analysis: {analysis_id} - {error_message}")
                 return True
@@ -488,9 +522,10 @@ class AnalysisService:
             return False
     
     @staticmethod
-    def get_analysis_by_id(session: Session, analysis_id: str) -> Optional[Analysis]:
-        """Get analysis by ID"""
-        return session.query(Analysis).filter(Analysis.id == analysis_id).first()
+    def get_analysis_by_id(session: Session, analysis_id: str, with_document: bool = False) -> Optional[Analysis]:
+        """Get analysis by ID (served from the session identity map when already loaded)"""
+        options = [joinedload(Analysis.document)] if with_document else None
+        return session.get(Analysis, analysis_id, options=options)
     
     @staticmethod
     def get_user_analyses(
@@ -509,14 +544,13 @@ class AnalysisService:
             if status_filter:
                 query = query.filter(Analysis.status == status_filter)
             
-            total_count = query.count()
-            
-            analyses = query.order_by(desc(Analysis.started_at))\
-                          .offset(offset)\
-                          .limit(page_size)\
-                          .all()
+            # Load each page's documents in one extra IN query instead of one per row
+            rows, total_count = _fetch_page_with_total(
+                query.options(selectinload(Analysis.document)).order_by(desc(Analysis.started_at)),
+                Analysis.id, offset, page_size
+            )
             
-            return analyses, total_count
+            return [row[0] for row in rows], total_count
         except Exception as e:
             logger.error(f"Error getting user analyses: {e}")
             return [], 0
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 
 from backend.core.database import get_database_manager
 from backend.services.services import DocumentService, UserService
+from backend.models.models import _utcnow
 
 logger = logging.getLogger(__name__)
 
@@ -233,7 +234,7 @@ class FileManager:
             # Clean up files for inactive users
             db_manager = get_database_manager()
             with db_manager.session_scope() as session:
-                cutoff_date = datetime.utcnow() - timedelta(days=self.cleanup_days)
+                cutoff_date = _utcnow() - timedelta(days=self.cleanup_days)
                 inactive_users = session.query(UserService.get_user_by_id.__self__.__class__).filter(
                     UserService.get_user_by_id.__self__.__class__.last_activity < cutoff_date
                 ).all()
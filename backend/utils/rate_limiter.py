@@ -0,0 +1,162 @@
+"""
+Rate Limiting
+Sliding-window request limiter backed by Redis sorted sets, used to protect
+expensive endpoints (bcrypt hashing, token generation) from abuse
+"""
+import os
+import math
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from typing import Tuple
+
+from fastapi import HTTPException, Request, status
+
+from backend.utils.redis_cache import redis_cache
+
+logger = logging.getLogger(__name__)
+
+# Every limit also applies per client IP (whatever email is sent) at this multiple of
+# the per-email limit, so rotating emails cannot bypass it
+IP_LIMIT_MULTIPLIER = int(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "4"))
+# How often the in-process fallback drops windows that have no hits left
+LOCAL_SWEEP_INTERVAL = 60
+# After a Redis error the in-process limiter is used for this long before Redis is tried again
+REDIS_RETRY_INTERVAL = int(os.getenv("RATE_LIMIT_REDIS_RETRY_SECONDS", "30"))
+
+# Atomically trims the window, checks the count and records the new hit.
+# Returns {allowed, retry_after_ms}
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local member = ARGV[4]
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry_after = window
+    if oldest[2] then
+        retry_after = tonumber(oldest[2]) + window - now
+    end
+    return {0, retry_after}
+end
+
+redis.call('ZADD', key, now, member)
+redis.call('PEXPIRE', key, window)
+return {1, 0}
+"""
+
+class RateLimiter:
+    """Sliding-window rate limiter (Redis with in-process fallback)"""
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.use_redis = os.getenv("REDIS_CACHE_ENABLED", "true").lower() == "true"
+        self._script = None
+        self._redis_retry_at = 0.0
+        # Fallback storage used when Redis is not available: key -> (window seconds, hit times)
+        self._local_windows = {}
+        self._local_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _get_script(self):
+        """The Lua script on the async Redis client, or None while Redis is backed off"""
+        if not self.use_redis or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._script is None:
+            # Registration only hashes the script; it is loaded on the first EVALSHA
+            self._script = redis_cache.aclient.register_script(SLIDING_WINDOW_SCRIPT)
+        return self._script
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
+        """Record a hit for key; returns (allowed, retry_after_seconds)"""
+        if not self.enabled:
+            return True, 0
+
+        script = self._get_script()
+        if script is not None:
+            try:
+                now_ms = int(time.time() * 1000)
+                allowed, retry_after_ms = await script(
+                    keys=[f"ratelimit:{key}"],
+                    args=[now_ms, window_seconds * 1000, limit, f"{now_ms}:{uuid.uuid4().hex}"]
+                )
+                if not allowed:
+                    return False, max(1, math.ceil(int(retry_after_ms) / 1000))
+                return True, 0
+            except Exception as e:
+                self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+                logger.warning(
+                    f"Redis rate limit error for key {key}, using in-process limiter "
+                    f"for {REDIS_RETRY_INTERVAL}s: {e}"
+                )
+
+        return self._local_hit(key, limit, window_seconds)
+
+    def _local_hit(self, key: str, limit: int, window_seconds: int) -> Tuple[bool, int]:
+        """In-process sliding window (per worker) used when Redis is unavailable"""
+        now = time.monotonic()
+        with self._local_lock:
+            if now - self._last_sweep >= LOCAL_SWEEP_INTERVAL:
+                self._sweep_local(now)
+            _, window = self._local_windows.setdefault(key, (window_seconds, deque()))
+            while window and window[0] <= now - window_seconds:
+                window.popleft()
+            if len(window) >= limit:
+                return False, max(1, int(window[0] + window_seconds - now) + 1)
+            window.append(now)
+            return True, 0
+
+    def _sweep_local(self, now: float) -> None:
+        """Drop in-process windows whose hits have all expired (caller holds _local_lock)"""
+        expired = [
+            key for key, (window_seconds, window) in self._local_windows.items()
+            if not window or window[-1] <= now - window_seconds
+        ]
+        for key in expired:
+            del self._local_windows[key]
+        self._last_sweep = now
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
+
+def rate_limit(scope: str, limit: int, window_seconds: int):
+    """
+    FastAPI dependency factory enforcing a sliding-window limit
+
+    Two windows are checked: one per client IP and email in the JSON body, and one per
+    client IP alone (IP_LIMIT_MULTIPLIER times larger) so rotating emails cannot get
+    around the limit. The check runs (and rejects with 429) before the handler does any work.
+
+    Args:
+        scope: Name of the protected action (e.g. "login")
+        limit: Maximum requests allowed within the window for one IP and email
+        window_seconds: Window length in seconds
+    """
+    async def dependency(request: Request):
+        client_host = request.client.host if request.client else "unknown"
+        email = ""
+        try:
+            body = await request.json()
+            if isinstance(body, dict):
+                email = str(body.get("email") or "").strip().lower()
+        except Exception:
+            pass
+
+        allowed, retry_after = await rate_limiter.hit(f"{scope}:ip:{client_host}", limit * IP_LIMIT_MULTIPLIER, window_seconds)
+        if allowed:
+            allowed, retry_after = await rate_limiter.hit(f"{scope}:{client_host}:{email}", limit, window_seconds)
+        if not allowed:
+            logger.warning(f"Rate limit exceeded for {scope} from {client_host}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please try again later.",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    return dependency
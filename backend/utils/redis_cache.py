@@ -3,19 +3,85 @@ Redis Caching Layer
 Provides caching functionality for expensive operations like LLM calls and database queries
 """
 import redis
-import json
+import redis.asyncio as redis_async
 import hashlib
+import orjson
 import logging
-from typing import Any, Optional, Dict, Union
+from typing import Any, Optional, Dict, List, Union
 from datetime import datetime, timedelta
 import os
-from functools import wraps
+import time
+import asyncio
+import threading
+from functools import lru_cache, wraps
 import pickle
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+try:
+    import zstandard as zstd
+except ImportError:  # compression is optional
+    zstd = None
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
 logger = logging.getLogger(__name__)
 
+# Pickled values above this size are zstd-compressed when zstandard is installed.
+# Stored values carry a one-byte header; legacy entries (raw pickle, b"\x80...") still load
+COMPRESSION_THRESHOLD = int(os.getenv("REDIS_COMPRESSION_THRESHOLD", "1024"))
+_RAW_MARKER = b"\x00"
+_ZSTD_MARKER = b"\x01"
+
+def _serialize(value: Any) -> bytes:
+    """Pickle a value, compressing large payloads"""
+    raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if zstd is not None and len(raw) > COMPRESSION_THRESHOLD:
+        return _ZSTD_MARKER + zstd.ZstdCompressor(level=3).compress(raw)
+    return _RAW_MARKER + raw
+
+def _deserialize(data: bytes) -> Any:
+    """Inverse of _serialize (strips the header through a memoryview, so the payload is never copied)"""
+    marker = data[:1]
+    if marker == _ZSTD_MARKER:
+        return pickle.loads(zstd.ZstdDecompressor().decompress(memoryview(data)[1:]))
+    if marker == _RAW_MARKER:
+        return pickle.loads(memoryview(data)[1:])
+    return pickle.loads(data)
+
+# Decorator keys ("cache:<prefix>:<hash>") under the prefixes that get invalidated are
+# also recorded in a sorted set per prefix level, scored by their expiry time, so
+# invalidation deletes exactly those keys instead of scanning the keyspace. Expired
+# members are trimmed on every write, which keeps each tag bounded by its live keys.
+# Tag sets outlive the longest TTL used by the cache decorators
+CACHE_TAG_PREFIX = "cachetag:v2:"
+CACHE_TAG_TTL = int(os.getenv("REDIS_CACHE_TAG_TTL", "172800"))  # 2 days
+TAGGED_PREFIXES = frozenset({"analysis", "llm"})
+
+def _build_key(prefix: str, args: tuple, kwargs: dict) -> str:
+    """Hash the call arguments into a cache key (orjson + 128-bit BLAKE2b, both C-level)"""
+    key_data = {
+        "args": args,
+        "kwargs": sorted(kwargs.items())  # Sort for consistent ordering
+    }
+    key_bytes = orjson.dumps(key_data, default=str, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    key_hash = hashlib.blake2b(key_bytes, digest_size=16).hexdigest()
+    
+    return f"cache:{prefix}:{key_hash}"
+
+# Argument types whose keys can be memoized; values are paired with their type so
+# that 1, 1.0 and True (equal as dict keys) still map to distinct cache keys
+_MEMO_KEY_TYPES = frozenset({str, int, float, bool, type(None)})
+
+@lru_cache(maxsize=4096)
+def _memoized_key(prefix: str, typed_args: tuple, typed_kwargs: tuple) -> str:
+    """Cached _build_key for calls made only of scalar arguments"""
+    return _build_key(
+        prefix,
+        tuple(value for _, value in typed_args),
+        {name: value for name, _, value in typed_kwargs}
+    )
+
 class RedisCache:
     """Redis caching manager"""
     
@@ -23,47 +89,86 @@ class RedisCache:
         self.enabled = os.getenv("REDIS_CACHE_ENABLED", "true").lower() == "true"
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.default_ttl = int(os.getenv("REDIS_DEFAULT_TTL", "3600"))  # 1 hour
-        self.client = None
-        self._connect()
+        self.max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+        self._client = None
+        self._aclient = None
+        self._connect_attempted = False
+        self._connect_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Redis client, connected lazily on first use so startup never waits on Redis"""
+        if self._client is None and self.enabled and not self._connect_attempted:
+            with self._connect_lock:
+                if not self._connect_attempted:
+                    self._connect()
+        return self._client
+    
+    @property
+    def aclient(self):
+        """redis.asyncio client for coroutine callers (same URL, its own bounded pool)"""
+        if self._aclient is None:
+            self._aclient = redis_async.Redis(connection_pool=redis_async.BlockingConnectionPool.from_url(
+                self.redis_url,
+                max_connections=self.max_connections,
+                timeout=5,
+                decode_responses=False,
+                socket_connect_timeout=5,
+                socket_timeout=5,
+                retry_on_timeout=True
+            ))
+        return self._aclient
+    
+    async def _async_ready(self) -> bool:
+        """Whether Redis is usable; the one-time connection check runs off the event loop"""
+        if self._client is None and self.enabled and not self._connect_attempted:
+            await asyncio.to_thread(lambda: self.client)
+        return self.enabled and self._client is not None
         
     def _connect(self):
         """Connect to Redis"""
+        self._connect_attempted = True
         if not self.enabled:
             logger.info("Redis caching disabled")
             return
             
         try:
-            self.client = redis.from_url(
+            # Bounded, blocking pool shared by all threads; redis-py parses replies with
+            # hiredis (C) automatically when it is installed
+            pool = redis.BlockingConnectionPool.from_url(
                 self.redis_url,
+                max_connections=self.max_connections,
+                timeout=5,
                 decode_responses=False,  # Keep binary for pickle
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True
             )
+            client = redis.Redis(connection_pool=pool)
             
             # Test connection
-            self.client.ping()
+            client.ping()
+            self._client = client
             logger.info(f"✅ Connected to Redis: {self.redis_url}")
             
         except Exception as e:
             logger.warning(f"Failed to connect to Redis: {e}")
             logger.warning("Continuing without caching...")
             self.enabled = False
-            self.client = None
+            self._client = None
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Generate a cache key from function arguments"""
-        # Create a string representation of args and kwargs
-        key_data = {
-            "args": args,
-            "kwargs": sorted(kwargs.items())  # Sort for consistent ordering
-        }
-        
-        # Create hash of the serialized data
-        key_string = json.dumps(key_data, default=str, sort_keys=True)
-        key_hash = hashlib.md5(key_string.encode()).hexdigest()
-        
-        return f"cache:{prefix}:{key_hash}"
+        # Keys for plain scalar arguments are memoized per process; anything else
+        # (sessions, model objects, containers) takes the uncached path
+        if all(type(value) in _MEMO_KEY_TYPES for value in args) and \
+                all(type(value) in _MEMO_KEY_TYPES for value in kwargs.values()):
+            return _memoized_key(
+                prefix,
+                tuple((type(value), value) for value in args),
+                tuple(sorted((name, type(value), value) for name, value in kwargs.items()))
+            )
+        return _build_key(prefix, args, kwargs)
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
@@ -73,7 +178,7 @@ class RedisCache:
         try:
             value = self.client.get(key)
             if value is not None:
-                return pickle.loads(value)
+                return _deserialize(value)
             return None
         except Exception as e:
             logger.warning(f"Redis GET error for key {key}: {e}")
@@ -84,15 +189,203 @@ class RedisCache:
         if not self.enabled or not self.client:
             return False
             
+        try:
+            return self._store(key, _serialize(value), ttl)
+        except Exception as e:
+            logger.warning(f"Redis SET error for key {key}: {e}")
+            return False
+    
+    @staticmethod
+    def _tag_keys(key: str) -> List[str]:
+        """Tag sets a decorator key belongs to: one per prefix level, for TAGGED_PREFIXES only"""
+        parts = key.split(":")
+        if len(parts) < 3 or parts[0] != "cache" or parts[1] not in TAGGED_PREFIXES:
+            return []
+        prefix_parts = parts[1:-1]
+        return [f"{CACHE_TAG_PREFIX}{':'.join(prefix_parts[:i])}" for i in range(1, len(prefix_parts) + 1)]
+    
+    @classmethod
+    def _queue_tags(cls, pipe, key: str, ttl: int) -> None:
+        """Queue the commands recording key in its tag sets and trimming their expired members"""
+        now = time.time()
+        for tag_key in cls._tag_keys(key):
+            pipe.zadd(tag_key, {key: now + ttl})
+            pipe.zremrangebyscore(tag_key, "-inf", now)
+            pipe.expire(tag_key, CACHE_TAG_TTL)
+    
+    def _store(self, key: str, payload: bytes, ttl: Optional[int]) -> bool:
+        """SETEX the payload and record the key in its prefix tag sets, in one round trip"""
+        ttl = ttl or self.default_ttl
+        pipe = self.client.pipeline(transaction=False)
+        pipe.setex(key, ttl, payload)
+        self._queue_tags(pipe, key, ttl)
+        return bool(pipe.execute()[0])
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """Delete every key recorded under a prefix tag (e.g. "analysis", "llm:gpt-4")"""
+        if not self.enabled or not self.client:
+            return 0
+            
+        try:
+            tag_key = f"{CACHE_TAG_PREFIX}{tag}"
+            # Parent tags ("llm" for "llm:gpt-4") drop the deleted members as well
+            levels = tag.split(":")
+            parent_keys = [f"{CACHE_TAG_PREFIX}{':'.join(levels[:i])}" for i in range(1, len(levels))]
+            members = self.client.zrange(tag_key, 0, -1)
+            deleted = 0
+            for start in range(0, len(members), 1000):
+                batch = members[start:start + 1000]
+                deleted += self.client.unlink(*batch)
+                for parent_key in parent_keys:
+                    self.client.zrem(parent_key, *batch)
+            self.client.unlink(tag_key)
+            return deleted
+        except Exception as e:
+            logger.warning(f"Redis tag invalidation error for {tag}: {e}")
+            return 0
+    
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async get for coroutine callers"""
+        if not await self._async_ready():
+            return None
+            
+        try:
+            value = await self.aclient.get(key)
+            return _deserialize(value) if value is not None else None
+        except Exception as e:
+            logger.warning(f"Redis GET error for key {key}: {e}")
+            return None
+    
+    async def aset(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Async set (with prefix tags) for coroutine callers"""
+        if not await self._async_ready():
+            return False
+            
         try:
             ttl = ttl or self.default_ttl
-            serialized_value = pickle.dumps(value)
-            result = self.client.setex(key, ttl, serialized_value)
-            return bool(result)
+            pipe = self.aclient.pipeline(transaction=False)
+            pipe.setex(key, ttl, _serialize(value))
+            self._queue_tags(pipe, key, ttl)
+            return bool((await pipe.execute())[0])
         except Exception as e:
             logger.warning(f"Redis SET error for key {key}: {e}")
             return False
     
+    async def adelete(self, key: str) -> bool:
+        """Async delete for coroutine callers"""
+        if not await self._async_ready():
+            return False
+            
+        try:
+            return bool(await self.aclient.delete(key))
+        except Exception as e:
+            logger.warning(f"Redis DELETE error for key {key}: {e}")
+            return False
+    
+    async def aexists(self, key: str) -> bool:
+        """Async exists for coroutine callers"""
+        if not await self._async_ready():
+            return False
+            
+        try:
+            return bool(await self.aclient.exists(key))
+        except Exception as e:
+            logger.warning(f"Redis EXISTS error for key {key}: {e}")
+            return False
+    
+    async def aacquire_lock(self, key: str, ttl: int):
+        """Async acquire_lock; same return convention (lock, False or None)"""
+        if not await self._async_ready():
+            return None
+            
+        try:
+            lock = self.aclient.lock(f"{key}:lock", timeout=ttl)
+            return lock if await lock.acquire(blocking=False) else False
+        except Exception as e:
+            logger.warning(f"Redis LOCK error for key {key}: {e}")
+            return None
+    
+    async def arelease_lock(self, lock) -> None:
+        """Async release_lock"""
+        try:
+            await lock.release()
+        except Exception as e:
+            logger.debug("Redis UNLOCK error: %s", e)
+    
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get a raw (already serialized) value from cache"""
+        if not self.enabled or not self.client:
+            return None
+            
+        try:
+            return self.client.get(key)
+        except Exception as e:
+            logger.warning(f"Redis GET error for key {key}: {e}")
+            return None
+    
+    def set_bytes(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """Set a raw (already serialized) value in cache with TTL"""
+        if not self.enabled or not self.client:
+            return False
+            
+        try:
+            return self._store(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"Redis SET error for key {key}: {e}")
+            return False
+    
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values in one round trip (None for misses)"""
+        if not keys or not self.enabled or not self.client:
+            return [None] * len(keys)
+            
+        try:
+            values = self.client.mget(keys)
+            return [_deserialize(value) if value is not None else None for value in values]
+        except Exception as e:
+            logger.warning(f"Redis MGET error for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    def mset(self, mapping: Dict[str, Any], ttl: Optional[int] = None) -> bool:
+        """Set several values with TTL in one pipelined round trip"""
+        if not mapping or not self.enabled or not self.client:
+            return False
+            
+        try:
+            ttl = ttl or self.default_ttl
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, ttl, _serialize(value))
+            for key in mapping:
+                self._queue_tags(pipe, key, ttl)
+            return all(pipe.execute()[:len(mapping)])
+        except Exception as e:
+            logger.warning(f"Redis MSET error for {len(mapping)} keys: {e}")
+            return False
+    
+    def acquire_lock(self, key: str, ttl: int):
+        """
+        Try to take a non-blocking distributed lock for key
+        
+        Returns the lock, False if another caller holds it, or None if Redis is unavailable
+        """
+        if not self.enabled or not self.client:
+            return None
+            
+        try:
+            lock = self.client.lock(f"{key}:lock", timeout=ttl)
+            return lock if lock.acquire(blocking=False) else False
+        except Exception as e:
+            logger.warning(f"Redis LOCK error for key {key}: {e}")
+            return None
+    
+    def release_lock(self, lock) -> None:
+        """Release a lock taken with acquire_lock (no-op if it already expired)"""
+        try:
+            lock.release()
+        except Exception as e:
+            logger.debug("Redis UNLOCK error: %s", e)
+    
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
         if not self.enabled or not self.client:
@@ -122,10 +415,18 @@ class RedisCache:
             return 0
             
         try:
-            keys = self.client.keys(pattern)
-            if keys:
-                return self.client.delete(*keys)
-            return 0
+            # SCAN incrementally instead of a blocking KEYS, and UNLINK (non-blocking
+            # delete) each batch as it arrives
+            deleted = 0
+            batch = []
+            for key in self.client.scan_iter(match=pattern, count=1000):
+                batch.append(key)
+                if len(batch) >= 1000:
+                    deleted += self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.client.unlink(*batch)
+            return deleted
         except Exception as e:
             logger.warning(f"Redis FLUSH error for pattern {pattern}: {e}")
             return 0
@@ -162,17 +463,142 @@ class RedisCache:
 # Global cache instance
 redis_cache = RedisCache()
 
+# The single-flight lock expires this long after its holder stops renewing it (a crashed
+# worker); a live holder renews it every third of the TTL for as long as it computes.
+# Waiters poll the cache with backoff until the lock is gone or the wait cap is reached
+SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("CACHE_SINGLE_FLIGHT_TTL", "30"))
+SINGLE_FLIGHT_WAIT_LIMIT = int(os.getenv("CACHE_SINGLE_FLIGHT_WAIT_LIMIT", "900"))
+SINGLE_FLIGHT_INITIAL_WAIT = 0.05
+SINGLE_FLIGHT_MAX_WAIT = 1.0
+# Only these prefixes guard results worth a lock round trip per miss (crew runs, LLM calls)
+SINGLE_FLIGHT_PREFIXES = frozenset({"analysis", "llm"})
+
+def _single_flight_waits():
+    """Yield backoff delays until the waiting caller should give up and compute itself"""
+    delay, waited = SINGLE_FLIGHT_INITIAL_WAIT, 0.0
+    while waited < SINGLE_FLIGHT_WAIT_LIMIT:
+        yield delay
+        waited += delay
+        delay = min(delay * 2, SINGLE_FLIGHT_MAX_WAIT)
+
+def _uses_single_flight(prefix: str, args: tuple, kwargs: dict) -> bool:
+    """Whether a miss should take the lock; session arguments make every key unique"""
+    if prefix.split(":", 1)[0] not in SINGLE_FLIGHT_PREFIXES:
+        return False
+    return not any(isinstance(value, (Session, AsyncSession))
+                   for value in (*args, *kwargs.values()))
+
+class _LockRenewer:
+    """One daemon thread that keeps every held synchronous single-flight lock alive"""
+    
+    def __init__(self):
+        self._locks: Dict[int, Any] = {}
+        self._mutex = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def add(self, lock) -> None:
+        with self._mutex:
+            self._locks[id(lock)] = lock
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="cache-lock-renewer", daemon=True)
+                self._thread.start()
+    
+    def discard(self, lock) -> None:
+        with self._mutex:
+            self._locks.pop(id(lock), None)
+    
+    def _run(self) -> None:
+        while True:
+            time.sleep(SINGLE_FLIGHT_LOCK_TTL / 3)
+            with self._mutex:
+                locks = list(self._locks.values())
+            for lock in locks:
+                try:
+                    lock.reacquire()
+                except Exception as e:
+                    # Released since the snapshot, or lost to expiry; stop renewing it
+                    logger.debug("Redis lock renewal stopped: %s", e)
+                    self.discard(lock)
+
+_lock_renewer = _LockRenewer()
+
+async def _arenew_lock(lock) -> None:
+    """Keep an async single-flight lock alive; runs as a task the lock holder cancels"""
+    while True:
+        await asyncio.sleep(SINGLE_FLIGHT_LOCK_TTL / 3)
+        try:
+            await lock.reacquire()
+        except Exception as e:
+            logger.debug("Redis lock renewal stopped: %s", e)
+            return
+
+def _on_event_loop() -> bool:
+    """Whether the current thread is running an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
 def cache_result(prefix: str = "default", ttl: Optional[int] = None, 
                 invalidate_on_error: bool = True):
     """
     Decorator to cache function results
     
+    For the SINGLE_FLIGHT_PREFIXES, concurrent misses for the same key are coalesced:
+    the caller that takes the Redis lock computes the value (renewing the lock while it
+    runs) and the others poll the cache for it until the lock is released. Calls taking
+    a database session skip this, since their keys never repeat. Synchronous calls made
+    on an event loop thread never poll; they compute straight away instead of blocking it.
+    Coroutine functions get an async wrapper that talks to Redis through redis.asyncio.
+    
     Args:
         prefix: Cache key prefix
         ttl: Time to live in seconds
         invalidate_on_error: Whether to invalidate cache on function error
     """
     def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                cache_key = redis_cache._generate_key(prefix, *args, **kwargs)
+                
+                cached_result = await redis_cache.aget(cache_key)
+                if cached_result is not None:
+                    logger.debug("Cache HIT for %s", func.__name__)
+                    return cached_result
+                
+                logger.debug("Cache MISS for %s", func.__name__)
+                
+                lock = None
+                if _uses_single_flight(prefix, args, kwargs):
+                    lock = await redis_cache.aacquire_lock(cache_key, SINGLE_FLIGHT_LOCK_TTL)
+                if lock is False:
+                    # Another caller is computing this value; wait for it to land
+                    for delay in _single_flight_waits():
+                        await asyncio.sleep(delay)
+                        cached_result = await redis_cache.aget(cache_key)
+                        if cached_result is not None:
+                            return cached_result
+                        if not await redis_cache.aexists(f"{cache_key}:lock"):
+                            break  # Holder finished without caching (error or None result)
+                
+                renewer = asyncio.create_task(_arenew_lock(lock)) if lock else None
+                try:
+                    result = await func(*args, **kwargs)
+                    await redis_cache.aset(cache_key, result, ttl)
+                    return result
+                except Exception:
+                    if invalidate_on_error:
+                        await redis_cache.adelete(cache_key)
+                    raise
+                finally:
+                    if lock:
+                        renewer.cancel()
+                        await redis_cache.arelease_lock(lock)
+                    
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Generate cache key
@@ -181,10 +607,26 @@ def cache_result(prefix: str = "default", ttl: Optional[int] = None,
             # Try to get from cache first
             cached_result = redis_cache.get(cache_key)
             if cached_result is not None:
-                logger.debug(f"Cache HIT for {func.__name__}")
+                logger.debug("Cache HIT for %s", func.__name__)
                 return cached_result
             
-            logger.debug(f"Cache MISS for {func.__name__}")
+            logger.debug("Cache MISS for %s", func.__name__)
+            
+            lock = None
+            if _uses_single_flight(prefix, args, kwargs):
+                lock = redis_cache.acquire_lock(cache_key, SINGLE_FLIGHT_LOCK_TTL)
+            if lock is False and not _on_event_loop():
+                # Another caller is computing this value; wait for it to land
+                for delay in _single_flight_waits():
+                    time.sleep(delay)
+                    cached_result = redis_cache.get(cache_key)
+                    if cached_result is not None:
+                        return cached_result
+                    if not redis_cache.exists(f"{cache_key}:lock"):
+                        break  # Holder finished without caching (error or None result)
+            
+            if lock:
+                _lock_renewer.add(lock)
             
             try:
                 # Execute function
@@ -200,6 +642,10 @@ def cache_result(prefix: str = "default", ttl: Optional[int] = None,
                 if invalidate_on_error:
                     redis_cache.delete(cache_key)
                 raise
+            finally:
+                if lock:
+                    _lock_renewer.discard(lock)
+                    redis_cache.release_lock(lock)
                 
         return wrapper
     return decorator
@@ -216,6 +662,40 @@ def cache_analysis_result(ttl: int = 86400):
     """
     return cache_result(prefix="analysis", ttl=ttl)
 
+def cache_json_result(prefix: str = "default", ttl: Optional[int] = None):
+    """
+    Decorator caching a JSON-serializable result as encoded JSON bytes
+    
+    The wrapper returns a ready application/json Response, so a cache hit is served
+    straight from the stored bytes with no unpickling or re-serialization.
+    wrapper.invalidate(*args, **kwargs) drops the entry cached for those arguments.
+    
+    Args:
+        prefix: Cache key prefix
+        ttl: Time to live in seconds
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache_key = redis_cache._generate_key(prefix, *args, **kwargs)
+            
+            body = redis_cache.get_bytes(cache_key)
+            if body is not None:
+                logger.debug("Cache HIT for %s", func.__name__)
+            else:
+                logger.debug("Cache MISS for %s", func.__name__)
+                body = orjson.dumps(func(*args, **kwargs))
+                redis_cache.set_bytes(cache_key, body, ttl)
+            
+            return Response(content=body, media_type="application/json")
+        
+        def invalidate(*args, **kwargs) -> bool:
+            return redis_cache.delete(redis_cache._generate_key(prefix, *args, **kwargs))
+        
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
+
 def cache_database_query(table: str = "default", ttl: int = 1800):
     """
     Specialized decorator for caching database queries (30 minutes default)
@@ -231,17 +711,12 @@ def invalidate_user_cache(user_id: str):
 
 def invalidate_analysis_cache():
     """Invalidate all analysis cache entries"""
-    pattern = "cache:analysis:*"
-    count = redis_cache.flush_pattern(pattern)
+    count = redis_cache.invalidate_tag("analysis")
     logger.info(f"Invalidated {count} analysis cache entries")
 
 def invalidate_llm_cache(model: str = None):
     """Invalidate LLM cache entries"""
-    if model:
-        pattern = f"cache:llm:{model}:*"
-    else:
-        pattern = "cache:llm:*"
-    count = redis_cache.flush_pattern(pattern)
+    count = redis_cache.invalidate_tag(f"llm:{model}" if model else "llm")
     logger.info(f"Invalidated {count} LLM cache entries")
 
 # Example usage functions for testing
@@ -2,12 +2,36 @@ import os
 import re
 import time
 import logging
-from functools import wraps
+import threading
+import orjson
+from collections import Counter
+from contextlib import closing
+from functools import lru_cache, wraps
 from dotenv import load_dotenv
 from crewai_tools import SerperDevTool
 from crewai.tools import BaseTool
 from langchain_community.document_loaders import PyPDFLoader
 
+try:
+    import re2  # google-re2: linear-time (DFA) matching for the analyzer keyword/metric scans
+except ImportError:  # fall back to the stdlib backtracking engine
+    re2 = None
+
+try:
+    import pypdfium2 as pdfium  # PDFium (C++) text extraction, much faster than pypdf
+except ImportError:  # fall back to PyPDFLoader
+    pdfium = None
+
+# Public API: the tool classes, their shared instances and the metrics helpers
+__all__ = [
+    "FinancialDocumentReader", "InvestmentAnalyzer", "RiskAssessor", "DocumentClassifier",
+    "FinancialSearchTool", "InvestmentSearchTool", "RiskSearchTool", "IndustrySearchTool",
+    "search_tool", "financial_document_tool", "investment_analysis_tool", "risk_assessment_tool",
+    "document_classifier_tool", "financial_search_tool", "investment_search_tool",
+    "risk_search_tool", "industry_search_tool",
+    "track_tool_performance", "tool_performance_metrics", "get_tool_performance_summary",
+]
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -26,6 +50,66 @@ search_tool = SerperDevTool(api_key=SERPER_API_KEY)
 # Performance tracking for tools
 tool_performance_metrics = {}
 
+# Runs of blank lines in extracted PDF text collapse to a single newline
+# (PDFium ends lines with \r\n, pypdf with \n)
+_MULTI_NL_RE = re.compile(r'(?:\r?\n)+')
+PDF_TEXT_LIMIT = 100000  # 100KB of extracted text per document
+MIN_ANALYSIS_TEXT_LENGTH = 200  # Shorter inputs skip the analyzer scans
+
+# Engine for the analyzer scans over (up to) 100KB of text; patterns keep to the syntax
+# RE2 and re share (inline flags, no backreferences) so findall results are identical
+_scan_engine = re2 if re2 is not None else re
+
+@lru_cache(maxsize=8)
+def _ascii_lowercase(text: str) -> bytes:
+    """
+    Lowercased ASCII bytes of the document for the keyword scans (all terms are ASCII)
+    
+    One byte per character even when the text holds a non-ASCII character (which makes
+    a str 2-4 bytes wide), and RE2 scans bytes without re-encoding the text per call.
+    Non-ASCII characters (no-break spaces, dashes, curly quotes) become spaces rather than
+    being dropped, so the words on either side are never joined into a false match.
+    """
+    # "?" is a separator for every term, so the replacement marks can share it
+    return text.encode('ascii', 'replace').replace(b'?', b' ').lower()
+
+def _bucket_counter(term_buckets):
+    """
+    Compile one alternation over all terms (longest first) and return a function that
+    tallies hits per bucket in a single findall pass over _ascii_lowercase bytes
+    """
+    encoded = {term.encode(): bucket for term, bucket in term_buckets.items()}
+    pattern = _scan_engine.compile(b'|'.join(re.escape(term) for term in sorted(encoded, key=len, reverse=True)))
+    
+    def count(data: bytes) -> Counter:
+        return Counter(encoded[term] for term in pattern.findall(data))
+    return count
+
+# Financial metric patterns for InvestmentAnalyzer. The gap between the keyword and the
+# figure is capped at 80 characters on the same line, which bounds backtracking on long lines
+_REVENUE_RE = _scan_engine.compile(r'(?i)(?:revenue|sales)[^\n]{0,80}?(\$[\d,.]+ ?[bmk]?)')
+_PROFIT_RE = _scan_engine.compile(r'(?i)(?:profit|income|earnings)[^\n]{0,80}?(\$[\d,.]+ ?[bmk]?)')
+_MARGIN_RE = _scan_engine.compile(r'(?i)(?:margin)[^\n]{0,80}?([\d.]+%)')
+
+# Sentiment terms for InvestmentAnalyzer, mapped to their bucket
+SENTIMENT_TERMS = {
+    **dict.fromkeys(['growth', 'increase', 'profit', 'strong', 'improved', 'record'], 'positive'),
+    **dict.fromkeys(['decline', 'decrease', 'loss', 'weak', 'challenging', 'lower'], 'negative'),
+}
+_count_sentiment = _bucket_counter(SENTIMENT_TERMS)
+
+# Risk indicators for RiskAssessor (report order matters)
+RISK_INDICATORS = {
+    'debt': {'terms': ['debt', 'loan', 'borrowing', 'liability'], 'weight': 2},
+    'litigation': {'terms': ['litigation', 'lawsuit', 'legal', 'settlement'], 'weight': 3},
+    'regulatory': {'terms': ['regulatory', 'compliance', 'violation', 'investigation'], 'weight': 3},
+    'market': {'terms': ['market risk', 'volatility', 'uncertainty', 'competition'], 'weight': 2},
+    'operational': {'terms': ['supply chain', 'disruption', 'shortage', 'delay'], 'weight': 2},
+    'financial': {'terms': ['loss', 'decline', 'decrease', 'impairment'], 'weight': 2}
+}
+RISK_TERM_TYPES = {term: risk_type for risk_type, data in RISK_INDICATORS.items() for term in data['terms']}
+_count_risks = _bucket_counter(RISK_TERM_TYPES)
+
 def track_tool_performance(tool_name):
     def decorator(func):
         @wraps(func)
@@ -46,6 +130,56 @@ def track_tool_performance(tool_name):
         return wrapper
     return decorator
 
+# PDFium is not thread-safe; tools run on several crew threads at once
+_PDFIUM_LOCK = threading.Lock()
+
+def _iter_pdf_pages(file_path: str):
+    """Yield the raw text of each page, using PDFium when installed and pypdf otherwise"""
+    if pdfium is None:
+        for data in PyPDFLoader(file_path).lazy_load():
+            yield data.page_content
+        return
+    
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_bounded()
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+@lru_cache(maxsize=32)
+def _load_pdf_text(file_path: str, mtime_ns: int, size: int) -> str:
+    """Parse and clean a PDF; mtime_ns and size only key the cache"""
+    # Pages are parsed one at a time and parsing stops once the size limit is passed,
+    # so a long filing is never held in memory in full
+    parts = []
+    total_size = 0
+    with closing(_iter_pdf_pages(file_path)) as pages:
+        for page_text in pages:
+            # Clean up multiple newlines
+            content = _MULTI_NL_RE.sub('\n', page_text) + "\n"
+            parts.append(content)
+            total_size += len(content)
+            if total_size > PDF_TEXT_LIMIT:
+                break
+    
+    if not parts:
+        return "Error: PDF file appears to be empty or corrupted."
+    
+    full_report = "".join(parts)
+    
+    # Limit output size to prevent memory issues
+    if len(full_report) > PDF_TEXT_LIMIT:
+        full_report = full_report[:PDF_TEXT_LIMIT] + "\n[Content truncated due to size...]"
+        
+    return full_report
+
 class FinancialDocumentReader(BaseTool):
     name: str = "Financial Document Reader"
     description: str = "Reads and processes financial documents from PDF files"
@@ -62,36 +196,20 @@ class FinancialDocumentReader(BaseTool):
             str: Cleaned and processed text content from the PDF
         """
         try:
-            # Validate file exists
-            if not os.path.exists(file_path):
+            # Validate file exists (one stat serves both this check and the cache key below)
+            abs_path = os.path.abspath(file_path)
+            try:
+                st = os.stat(abs_path)
+            except FileNotFoundError:
                 return f"Error: File {file_path} does not exist."
             
             # Validate file extension
             if not file_path.lower().endswith('.pdf'):
                 return f"Error: File {file_path} is not a PDF file."
             
-            # If the path doesn't start with /, prepend the current directory
-            if not file_path.startswith('/'):
-                file_path = os.path.join(os.getcwd(), file_path)
-            
-            loader = PyPDFLoader(file_path)
-            docs = loader.load()
-            
-            if not docs:
-                return "Error: PDF file appears to be empty or corrupted."
-            
-            full_report = ""
-            for data in docs:
-                content = data.page_content
-                # Clean up multiple newlines
-                content = re.sub(r'\n+', '\n', content)
-                full_report += content + "\n"
-            
-            # Limit output size to prevent memory issues
-            if len(full_report) > 100000:  # 100KB limit
-                full_report = full_report[:100000] + "\n[Content truncated due to size...]"
-                
-            return full_report
+            # Every task of a crew run reads the same upload, so the parsed text is
+            # memoized on (path, mtime, size); a rewritten file misses the cache
+            return _load_pdf_text(abs_path, st.st_mtime_ns, st.st_size)
             
         except Exception as e:
             return f"Error reading PDF file: {str(e)}"
@@ -100,7 +218,7 @@ class InvestmentAnalyzer(BaseTool):
     name: str = "Investment Analyzer"
     description: str = "Analyzes financial document data and provides investment insights"
 
-    @cache_llm_result(model="investment-analysis", ttl=7200)  # Cache for 2 hours
+    @cache_llm_result(model="investment-analysis:v2", ttl=7200)  # Cache for 2 hours; v2 keys hold the JSON output
     @track_tool_performance("InvestmentAnalyzer")
     def _run(self, financial_document_data: str) -> str:
         """Analyze financial document data and provide investment insights.
@@ -109,55 +227,40 @@ class InvestmentAnalyzer(BaseTool):
             financial_document_data (str): Processed text from financial document
             
         Returns:
-            str: Investment analysis and recommendations
+            str: Investment analysis as compact JSON (metrics, sentiment, summary)
         """
         try:
             if not financial_document_data or len(financial_document_data.strip()) == 0:
                 return "Error: No financial data provided for analysis."
             
-            # Extract key financial metrics using regex patterns
-            revenue_pattern = r'(?:revenue|sales).*?(\$[\d,.]+ ?[bmk]?)'
-            profit_pattern = r'(?:profit|income|earnings).*?(\$[\d,.]+ ?[bmk]?)'
-            margin_pattern = r'(?:margin).*?([\d.]+%)'
-            
-            analysis = "## Investment Analysis\n\n"
-            
-            # Look for revenue information
-            revenue_matches = re.findall(revenue_pattern, financial_document_data, re.IGNORECASE)
-            if revenue_matches:
-                analysis += f"**Revenue Highlights:** Found revenue figures: {', '.join(revenue_matches[:3])}\n\n"
+            # Too little text to hold any metrics (e.g. an error string passed on by
+            # another tool): answer without running the scans
+            if len(financial_document_data) < MIN_ANALYSIS_TEXT_LENGTH:
+                return "Error: Insufficient financial data for meaningful analysis."
             
-            # Look for profit information
-            profit_matches = re.findall(profit_pattern, financial_document_data, re.IGNORECASE)
-            if profit_matches:
-                analysis += f"**Profitability:** Identified profit metrics: {', '.join(profit_matches[:3])}\n\n"
-            
-            # Look for margin information
-            margin_matches = re.findall(margin_pattern, financial_document_data, re.IGNORECASE)
-            if margin_matches:
-                analysis += f"**Margins:** Found margin data: {', '.join(margin_matches[:3])}\n\n"
-            
-            # Basic sentiment analysis based on key terms
-            positive_terms = ['growth', 'increase', 'profit', 'strong', 'improved', 'record']
-            negative_terms = ['decline', 'decrease', 'loss', 'weak', 'challenging', 'lower']
-            
-            positive_count = sum(financial_document_data.lower().count(term) for term in positive_terms)
-            negative_count = sum(financial_document_data.lower().count(term) for term in negative_terms)
+            # Basic sentiment analysis based on key terms (one scan over the lowercased text)
+            sentiment_counts = _count_sentiment(_ascii_lowercase(financial_document_data))
+            positive_count = sentiment_counts['positive']
+            negative_count = sentiment_counts['negative']
             
             if positive_count > negative_count:
-                analysis += "**Overall Sentiment:** Generally positive financial indicators detected.\n\n"
+                sentiment, summary = "positive", "Generally positive financial indicators detected."
             elif negative_count > positive_count:
-                analysis += "**Overall Sentiment:** Some challenging financial indicators detected.\n\n"
+                sentiment, summary = "negative", "Some challenging financial indicators detected."
             else:
-                analysis += "**Overall Sentiment:** Mixed financial indicators detected.\n\n"
-            
-            analysis += "**Investment Considerations:**\n"
-            analysis += "- Review detailed financial statements for complete analysis\n"
-            analysis += "- Consider market conditions and industry trends\n"
-            analysis += "- Evaluate long-term growth prospects\n"
-            analysis += "- Assess risk factors and competitive position\n"
-            
-            return analysis
+                sentiment, summary = "mixed", "Mixed financial indicators detected."
+            
+            # Compact JSON rather than Markdown: this output is fed into the next agent's prompt
+            return orjson.dumps({
+                # Key financial metrics (patterns are precompiled at module level)
+                "revenue": _REVENUE_RE.findall(financial_document_data)[:3],
+                "profit": _PROFIT_RE.findall(financial_document_data)[:3],
+                "margins": _MARGIN_RE.findall(financial_document_data)[:3],
+                "sentiment": sentiment,
+                "positive_indicators": positive_count,
+                "negative_indicators": negative_count,
+                "summary": summary
+            }).decode()
             
         except Exception as e:
             return f"Error analyzing investment data: {str(e)}"
@@ -166,7 +269,7 @@ class RiskAssessor(BaseTool):
     name: str = "Risk Assessor"
     description: str = "Assesses risks based on financial document data"
 
-    @cache_llm_result(model="risk-assessment", ttl=7200)  # Cache for 2 hours
+    @cache_llm_result(model="risk-assessment:v2", ttl=7200)  # Cache for 2 hours; v2 keys hold the JSON output
     @track_tool_performance("RiskAssessor")
     def _run(self, financial_document_data: str) -> str:
         """Assess risks based on financial document data.
@@ -175,67 +278,51 @@ class RiskAssessor(BaseTool):
             financial_document_data (str): Processed text from financial document
             
         Returns:
-            str: Risk assessment analysis and warnings
+            str: Risk assessment as compact JSON (level, score, factors, summary)
         """
         try:
             if not financial_document_data or len(financial_document_data.strip()) == 0:
                 return "Error: No financial data provided for risk assessment."
             
-            risk_assessment = "## Risk Assessment\n\n"
-            risk_score = 0
-            risks_identified = []
+            if len(financial_document_data) < MIN_ANALYSIS_TEXT_LENGTH:
+                return "Error: Insufficient financial data for meaningful risk assessment."
             
-            # Check for common risk indicators
-            risk_indicators = {
-                'debt': {'terms': ['debt', 'loan', 'borrowing', 'liability'], 'weight': 2},
-                'litigation': {'terms': ['litigation', 'lawsuit', 'legal', 'settlement'], 'weight': 3},
-                'regulatory': {'terms': ['regulatory', 'compliance', 'violation', 'investigation'], 'weight': 3},
-                'market': {'terms': ['market risk', 'volatility', 'uncertainty', 'competition'], 'weight': 2},
-                'operational': {'terms': ['supply chain', 'disruption', 'shortage', 'delay'], 'weight': 2},
-                'financial': {'terms': ['loss', 'decline', 'decrease', 'impairment'], 'weight': 2}
-            }
+            # Check for common risk indicators (one scan tallies every term)
+            text_lower = _ascii_lowercase(financial_document_data)
+            risk_counts = _count_risks(text_lower)
             
-            for risk_type, data in risk_indicators.items():
-                count = sum(financial_document_data.lower().count(term) for term in data['terms'])
+            risk_score = 0
+            factors = []
+            for risk_type, data in RISK_INDICATORS.items():
+                count = risk_counts[risk_type]
                 if count > 0:
                     risk_score += count * data['weight']
-                    risks_identified.append(f"{risk_type.title()} Risk: {count} indicators found")
+                    factors.append({"type": risk_type, "indicators": count})
             
             # Risk level assessment
             if risk_score <= 10:
                 risk_level = "LOW"
-                risk_color = "🟢"
             elif risk_score <= 25:
                 risk_level = "MODERATE"
-                risk_color = "🟡"
             elif risk_score <= 50:
                 risk_level = "HIGH"
-                risk_color = "🟠"
             else:
                 risk_level = "VERY HIGH"
-                risk_color = "🔴"
-            
-            risk_assessment += f"**Overall Risk Level:** {risk_color} {risk_level} (Score: {risk_score})\n\n"
-            
-            if risks_identified:
-                risk_assessment += "**Risk Factors Identified:**\n"
-                for risk in risks_identified[:5]:  # Limit to top 5 risks
-                    risk_assessment += f"- {risk}\n"
-                risk_assessment += "\n"
-            
-            # Risk mitigation recommendations
-            risk_assessment += "**Risk Mitigation Recommendations:**\n"
-            risk_assessment += "- Diversify investment portfolio to reduce concentration risk\n"
-            risk_assessment += "- Monitor financial metrics and market conditions regularly\n"
-            risk_assessment += "- Stay informed about regulatory changes and industry trends\n"
-            risk_assessment += "- Consider hedging strategies for market volatility\n"
-            risk_assessment += "- Evaluate management quality and corporate governance\n\n"
             
             # Cash flow and liquidity assessment
-            if 'cash flow' in financial_document_data.lower():
-                risk_assessment += "**Liquidity Assessment:** Cash flow information detected - review for liquidity risks\n"
-            
-            return risk_assessment
+            cash_flow_mentioned = b'cash flow' in text_lower
+            summary = f"{risk_level} risk (score {risk_score}) across {len(factors)} risk categories."
+            if cash_flow_mentioned:
+                summary += " Cash flow information present; review liquidity."
+            
+            # Compact JSON rather than Markdown: this output is fed into the next agent's prompt
+            return orjson.dumps({
+                "risk_level": risk_level,
+                "risk_score": risk_score,
+                "factors": factors[:5],  # Limit to top 5 risks
+                "cash_flow_mentioned": cash_flow_mentioned,
+                "summary": summary
+            }).decode()
             
         except Exception as e:
             return f"Error assessing risks: {str(e)}"
@@ -264,45 +351,45 @@ class DocumentClassifier(BaseTool):
                     "confidence": 0.0
                 }
             
-            # Convert to lowercase for easier matching
-            text_lower = document_text.lower()
+            # Lowercased ASCII bytes, shared with the other analyzer tools (terms are bytes too)
+            text_lower = _ascii_lowercase(document_text)
             
             # Identify document type
             document_type = "unknown"
             processing_speed = "standard"
             
             # Check for annual reports (10-K, annual reports)
-            if any(term in text_lower for term in ['10-k', '10k', 'annual report', 'form 10-k']):
+            if any(term in text_lower for term in [b'10-k', b'10k', b'annual report', b'form 10-k']):
                 document_type = "annual_report"
                 processing_speed = "detailed"
             # Check for quarterly reports (10-Q, quarterly reports)
-            elif any(term in text_lower for term in ['10-q', '10q', 'quarterly report', 'form 10-q']):
+            elif any(term in text_lower for term in [b'10-q', b'10q', b'quarterly report', b'form 10-q']):
                 document_type = "quarterly_report"
                 processing_speed = "fast"
             # Check for earnings reports
-            elif any(term in text_lower for term in ['earnings', 'results', 'quarterly earnings', 'financial results']):
+            elif any(term in text_lower for term in [b'earnings', b'results', b'quarterly earnings', b'financial results']):
                 document_type = "earnings_report"
                 processing_speed = "fast"
             # Check for prospectus
-            elif any(term in text_lower for term in ['prospectus', 'registration statement']):
+            elif any(term in text_lower for term in [b'prospectus', b'registration statement']):
                 document_type = "prospectus"
                 processing_speed = "detailed"
             # Check for other financial statements
-            elif any(term in text_lower for term in ['balance sheet', 'income statement', 'cash flow statement']):
+            elif any(term in text_lower for term in [b'balance sheet', b'income statement', b'cash flow statement']):
                 document_type = "financial_statement"
                 processing_speed = "standard"
             
             # Identify industry sector
             industry = "general"
             industry_keywords = {
-                "technology": ["technology", "software", "tech", "computer", "internet", "digital", "ai", "artificial intelligence"],
-                "finance": ["bank", "financial", "insurance", "investment", "credit", "loan", "mortgage"],
-                "healthcare": ["pharmaceutical", "biotech", "medical", "healthcare", "hospital", "drug"],
-                "energy": ["energy", "oil", "gas", "petroleum", "renewable", "solar", "wind"],
-                "retail": ["retail", "store", "shopping", "consumer", "ecommerce", "e-commerce"],
-                "manufacturing": ["manufacturing", "factory", "production", "industrial", "equipment"],
-                "automotive": ["automotive", "car", "vehicle", "auto", "motor"],
-                "real_estate": ["real estate", "property", "housing", "reit", "realty"]
+                "technology": [b"technology", b"software", b"tech", b"computer", b"internet", b"digital", b"ai", b"artificial intelligence"],
+                "finance": [b"bank", b"financial", b"insurance", b"investment", b"credit", b"loan", b"mortgage"],
+                "healthcare": [b"pharmaceutical", b"biotech", b"medical", b"healthcare", b"hospital", b"drug"],
+                "energy": [b"energy", b"oil", b"gas", b"petroleum", b"renewable", b"solar", b"wind"],
+                "retail": [b"retail", b"store", b"shopping", b"consumer", b"ecommerce", b"e-commerce"],
+                "manufacturing": [b"manufacturing", b"factory", b"production", b"industrial", b"equipment"],
+                "automotive": [b"automotive", b"car", b"vehicle", b"auto", b"motor"],
+                "real_estate": [b"real estate", b"property", b"housing", b"reit", b"realty"]
             }
             
             # Find the industry with the most matching keywords
@@ -1,14 +1,25 @@
 # Authentication imports
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, status, Depends, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import select, exists
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
-import uuid
+import asyncio
+import secrets
 import time
 import logging
 from pathlib import Path
 import magic
-from datetime import datetime
+import orjson
+import jinja2
+import hashlib
+import re
+import concurrent.futures
+import functools
+import threading
+from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 
 from crewai import Crew, Process
@@ -18,7 +29,12 @@ from typing import List, Optional
 from crewai import Crew, Process
 from backend.core.agents import (
     financial_analyst, data_extractor, investment_analyst, risk_analyst,
-    document_verifier, investment_specialist, risk_assessor, report_coordinator
+    document_verifier, investment_specialist, risk_assessor, report_coordinator,
+    create_dynamic_agents, get_agent_performance_summary, llm_observability,
+    get_llm_metrics as get_agent_llm_metrics
+)
+from backend.utils.tools import (
+    financial_document_tool, document_classifier_tool, get_tool_performance_summary
 )
 from backend.core.task import (
     comprehensive_financial_analysis,
@@ -27,10 +43,11 @@ from backend.core.task import (
 )
 
 # Database imports
-from backend.core.database import init_database, get_db_session, get_database_manager
+from backend.core.database import init_database, get_db_session, get_async_db_session
 from backend.services.services import UserService, DocumentService, AnalysisService, AnalysisHistoryService
 from backend.models.models import (
     User,
+    _utcnow,
     Document,
     Analysis,
     AnalysisResponse, DocumentResponse, AnalysisHistoryResponse,
@@ -49,9 +66,17 @@ from backend.auth.auth_middleware import (
 )
 
 # Import Redis cache
-from backend.utils.redis_cache import cache_result, cache_llm_result, cache_analysis_result
+from backend.utils.redis_cache import (
+    redis_cache, cache_result, cache_llm_result, cache_analysis_result, cache_json_result,
+    invalidate_analysis_cache, invalidate_llm_cache
+)
+
+# Rate limiting for expensive authentication endpoints
+from backend.utils.rate_limiter import rate_limit
 
 # Setup logging
+import atexit
+import queue
 import logging.handlers
 from datetime import datetime
 
@@ -79,9 +104,15 @@ file_handler = logging.FileHandler(log_filename)
 file_handler.setLevel(logging.INFO)
 file_handler.setFormatter(formatter)
 
-# Add handlers to logger
-logger.addHandler(console_handler)
-logger.addHandler(file_handler)
+# Route records through a queue so console/file I/O happens on a background
+# thread instead of blocking request handlers on the event loop
+log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(
+    log_queue, console_handler, file_handler, respect_handler_level=True
+)
+log_listener.start()
+atexit.register(log_listener.stop)
 
 # Add separator line to distinguish new logs from old ones
 separator = "=" * 80
@@ -150,7 +181,8 @@ except Exception as e:
 app = FastAPI(
     title="Financial Document Analyzer",
     description="AI-powered financial document analysis system with persistent storage",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware for frontend integration
@@ -162,15 +194,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Single fallback for errors not raised as HTTPException by a route"""
+    logger.exception(f"Unhandled error on {request.method} {request.url.path}: {exc}")
+    return ORJSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"detail": "Internal server error"}
+    )
+
 # Configuration
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_EXTENSIONS = {'.pdf'}
 UPLOAD_DIR = "data"
 OUTPUT_DIR = "output"
 KEEP_UPLOADED_FILES = os.getenv('KEEP_UPLOADED_FILES', 'false').lower() == 'true'
+# "fanout": five-task crew with the investment/risk branches in parallel (throughput);
+# "single": one comprehensive task, i.e. one LLM round trip (interactive latency)
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'fanout').lower()
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB read size when streaming uploads to disk
+MIME_SNIFF_BYTES = 4096  # libmagic only needs the file header to identify a PDF
 
-# Create output directory if it doesn't exist
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# Shared libmagic handle: the magic database is loaded once instead of on every upload
+try:
+    MIME_DETECTOR = magic.Magic(mime=True)
+except Exception as e:
+    MIME_DETECTOR = None
+    logger.warning(f"libmagic not available, using extension-based validation: {e}")
+# Minimum wall-clock time for /auth/forgot-password responses (hides account existence)
+FORGOT_PASSWORD_MIN_RESPONSE_SECONDS = float(os.getenv('FORGOT_PASSWORD_MIN_RESPONSE_SECONDS', 0.5))
+
+# Pre-serialized bodies for fixed auth responses (encoded once, not per request)
+LOGOUT_OK_BODY = orjson.dumps({"message": "Successfully logged out"})
+PASSWORD_CHANGED_BODY = orjson.dumps({"message": "Password changed successfully"})
+PASSWORD_RESET_REQUESTED_BODY = orjson.dumps({"message": "If the email exists, a reset link has been sent"})
+PASSWORD_RESET_OK_BODY = orjson.dumps({"message": "Password reset successfully"})
+
+# Create upload and output directories once at startup; request paths are built from these
+UPLOAD_PATH = Path(UPLOAD_DIR)
+OUTPUT_PATH = Path(OUTPUT_DIR)
+UPLOAD_PATH.mkdir(parents=True, exist_ok=True)
+OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+
+# Shared worker pool for CrewAI analyses; bounds how many run at once across requests.
+# Threads rather than processes: crews, LLM clients and the performance trackers are
+# not picklable and rely on this module's in-memory state. An analysis spends nearly all
+# of its time waiting on LLM and search APIs, so the default follows ThreadPoolExecutor's
+# own sizing for IO-bound work instead of the CPU count
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+ANALYSIS_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ANALYSIS_WORKERS,
+    thread_name_prefix="analysis"
+)
+atexit.register(ANALYSIS_EXECUTOR.shutdown, wait=False, cancel_futures=True)
+
+# Fan-out pool for the independent investment/risk leg of the parallel crew (two slots
+# per in-flight analysis). Kept separate from ANALYSIS_EXECUTOR so a running analysis
+# never waits on a slot its own pool is holding
+CREW_BRANCH_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2 * ANALYSIS_WORKERS,
+    thread_name_prefix="crew-branch"
+)
+atexit.register(CREW_BRANCH_EXECUTOR.shutdown, wait=False, cancel_futures=True)
+PARALLEL_BRANCH_TIMEOUT = 300  # 5 minutes for the investment and risk branches together
+# Run time (excluding the wait for a free analysis worker) after which a still-running
+# analysis is reported as overdue
+ANALYSIS_TIMEOUT = 900  # 15 minutes for complex financial analysis
+ANALYSIS_TIMEOUT_MESSAGE = f"Analysis timed out after {ANALYSIS_TIMEOUT // 60} minutes"
 
 def get_client_info(request: Request) -> dict:
     """Extract client information from request"""
@@ -180,7 +270,17 @@ def get_client_info(request: Request) -> dict:
     }
 
 def get_or_create_user(session: Session, request: Request) -> str:
-    """Get or create user session"""
+    """Get or create user session (resolved once per request and memoized on request.state)"""
+    cached_user_id = getattr(request.state, "user_id", None)
+    if cached_user_id:
+        return cached_user_id
+    
+    user_id = _resolve_request_user(session, request)
+    request.state.user_id = user_id
+    return user_id
+
+def _resolve_request_user(session: Session, request: Request) -> str:
+    """Look up (or create) the user behind a request"""
     # Try to get user from authenticated session first
     try:
         # Check for Authorization header (Bearer token)
@@ -189,6 +289,7 @@ def get_or_create_user(session: Session, request: Request) -> str:
             token = auth_header.split(" ")[1]
             user = auth_service.get_current_user(session, token)
             if user:
+                session.commit()  # get_current_user only flushes the last_activity update
                 return user.id
     except Exception as e:
         logger.debug(f"Failed to get user from auth token: {e}")
@@ -201,7 +302,7 @@ def get_or_create_user(session: Session, request: Request) -> str:
         user = UserService.get_user_by_session_id(session, session_id)
         if user:
             # Update last activity
-            user.last_activity = datetime.utcnow()
+            user.last_activity = _utcnow()
             session.commit()
             return user.id
     
@@ -233,6 +334,56 @@ def validate_file(file: UploadFile) -> tuple[bool, str]:
         logger.error(f"Error validating file: {e}")
         return False, f"File validation error: {str(e)}"
 
+# User-friendly messages for common analysis failures, in priority order
+# (when several keywords occur in one error, the earliest entry wins)
+ANALYSIS_ERROR_MESSAGES = [
+    (("insufficient_quota", "429"), "OpenAI API quota exceeded. Please check your OpenAI plan and billing details. For more information, visit https://platform.openai.com/docs/guides/error-codes/api-errors"),
+    (("rate limit",), "API rate limit exceeded. Please try again later."),
+    (("timeout",), "Request timed out. Please try again with a simpler query or check your network connection."),
+    (("authentication", "unauthorized"), "Authentication failed. Please check your API credentials."),
+    (("permission", "forbidden"), "Access forbidden. Please check your permissions."),
+    (("not found",), "Resource not found. The requested resource may have been deleted."),
+    (("network", "connection"), "Network error. Please check your internet connection and try again."),
+]
+_ERROR_KEYWORD_PRIORITY = {
+    keyword: priority
+    for priority, (keywords, _) in enumerate(ANALYSIS_ERROR_MESSAGES)
+    for keyword in keywords
+}
+_ERROR_KEYWORD_PATTERN = re.compile(
+    "|".join(re.escape(keyword) for keyword in _ERROR_KEYWORD_PRIORITY), re.IGNORECASE
+)
+
+def classify_analysis_error(error_message: str) -> str:
+    """Map a raw analysis error to a user-friendly message in a single regex scan"""
+    priorities = [_ERROR_KEYWORD_PRIORITY[match.group(0).lower()] for match in _ERROR_KEYWORD_PATTERN.finditer(error_message)]
+    if not priorities:
+        return error_message
+    return ANALYSIS_ERROR_MESSAGES[min(priorities)][1]
+
+def save_upload(source, file_path: str, max_size: int) -> tuple[int, bytes]:
+    """
+    Copy an uploaded file object to file_path, returning (bytes_read, sha256 digest)
+    
+    Reads into one reusable buffer instead of allocating a bytes object per chunk,
+    and stops as soon as max_size is exceeded (the caller rejects the upload).
+    """
+    file_hasher = hashlib.sha256()
+    file_size = 0
+    buffer = bytearray(UPLOAD_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "wb") as out:
+        while True:
+            read = source.readinto(buffer)
+            if not read:
+                break
+            file_size += read
+            if file_size > max_size:
+                break
+            file_hasher.update(view[:read])
+            out.write(view[:read])
+    return file_size, file_hasher.digest()
+
 @cache_analysis_result(ttl=14400)  # Cache for 4 hours
 def run_crew(query: str, file_path: str) -> str:
     """Run the CrewAI crew for financial analysis"""
@@ -280,7 +431,6 @@ def run_crew(query: str, file_path: str) -> str:
             
             # Try to extract PDF content and provide a basic analysis
             try:
-                from backend.utils.tools import financial_document_tool
                 pdf_content = financial_document_tool._run(file_path)
                 
                 # Provide a fallback analysis
@@ -321,7 +471,6 @@ We apologize for the inconvenience. Please contact support if this issue continu
         logger.error(f"Error running crew: {e}")
         # Generate a fallback analysis in case of complete failure
         try:
-            from backend.utils.tools import financial_document_tool
             pdf_content = financial_document_tool._run(file_path)
             fallback_analysis = generate_fallback_analysis(pdf_content[:2000], query)
             logger.info("Generated fallback analysis due to CrewAI exception")
@@ -336,8 +485,6 @@ We apologize for the inconvenience. Please contact support if this issue continu
 @cache_analysis_result(ttl=14400)  # Cache for 4 hours
 def generate_fallback_analysis(pdf_content: str, query: str) -> str:
     """Generate a basic fallback analysis when CrewAI fails"""
-    import re
-    
     # Extract basic information
     content_lower = pdf_content.lower()
     
@@ -548,9 +695,6 @@ def run_parallel_multi_agent_crew(query: str, file_path: str) -> str:
         logger.info(f"Financial analysis completed in {financial_time:.2f} seconds")
         
         # Run investment and risk analysis in parallel using ThreadPoolExecutor
-        import concurrent.futures
-        import threading
-        
         def run_investment_analysis():
             investment_start = time.time()
             investment_crew = Crew(
@@ -587,23 +731,25 @@ def run_parallel_multi_agent_crew(query: str, file_path: str) -> str:
             logger.info(f"Risk analysis completed in {risk_time:.2f} seconds")
             return result, risk_time
         
-        # Execute investment and risk analysis in parallel
+        # Execute investment and risk analysis in parallel: both branches share one
+        # deadline, and a timed-out branch is left running in the shared pool instead of
+        # blocking this request in an executor shutdown
         parallel_start = time.time()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-            investment_future = executor.submit(run_investment_analysis)
-            risk_future = executor.submit(run_risk_analysis)
-            
-            try:
-                investment_result, investment_time = investment_future.result(timeout=300)  # 5 minute timeout
-            except TimeoutError:
-                logger.error("Investment analysis timed out after 5 minutes")
-                investment_result, investment_time = "Investment analysis timed out", 300
-            
-            try:
-                risk_result, risk_time = risk_future.result(timeout=300)  # 5 minute timeout
-            except TimeoutError:
-                logger.error("Risk analysis timed out after 5 minutes")
-                risk_result, risk_time = "Risk analysis timed out", 300
+        investment_future = CREW_BRANCH_EXECUTOR.submit(run_investment_analysis)
+        risk_future = CREW_BRANCH_EXECUTOR.submit(run_risk_analysis)
+        concurrent.futures.wait([investment_future, risk_future], timeout=PARALLEL_BRANCH_TIMEOUT)
+        
+        if investment_future.done():
+            investment_result, investment_time = investment_future.result()
+        else:
+            logger.error("Investment analysis timed out after 5 minutes")
+            investment_result, investment_time = "Investment analysis timed out", PARALLEL_BRANCH_TIMEOUT
+        
+        if risk_future.done():
+            risk_result, risk_time = risk_future.result()
+        else:
+            logger.error("Risk analysis timed out after 5 minutes")
+            risk_result, risk_time = "Risk analysis timed out", PARALLEL_BRANCH_TIMEOUT
                 
         parallel_time = time.time() - parallel_start
         logger.info(f"Parallel analyses completed in {parallel_time:.2f} seconds")
@@ -664,8 +810,6 @@ def run_dynamic_multi_agent_crew(query: str, file_path: str) -> str:
         logger.info("Starting dynamic multi-agent financial analysis workflow")
         
         # First, read and classify the document
-        from backend.utils.tools import financial_document_tool, document_classifier_tool
-        
         # Read the document with timeout handling
         try:
             document_content = financial_document_tool._run(file_path)
@@ -690,7 +834,6 @@ def run_dynamic_multi_agent_crew(query: str, file_path: str) -> str:
         logger.info(f"Document classified as: {document_type} in {industry} industry with {processing_speed} processing speed")
         
         # Create dynamic agents based on classification
-        from backend.core.agents import create_dynamic_agents
         dynamic_agents = create_dynamic_agents(document_type, industry, processing_speed)
         
         # Create the crew with dynamic agents
@@ -766,11 +909,15 @@ def run_dynamic_multi_agent_crew(query: str, file_path: str) -> str:
         return run_parallel_multi_agent_crew(query, file_path)
 
 def run_crew_with_mode(query: str, file_path: str, use_enhanced: bool = True) -> str:
-    """Run crew analysis with only the parallel multi-agent approach as the single execution method"""
-    # Always use the parallel multi-agent approach as the single execution method
+    """Run crew analysis with the pipeline selected by PIPELINE_MODE"""
+    if PIPELINE_MODE == "single":
+        # One comprehensive task: a single LLM round trip instead of five chained ones
+        return run_crew(query, file_path)
+    # Default: the parallel multi-agent pipeline
     # All existing functions are preserved for backward compatibility
     return run_parallel_multi_agent_crew(query, file_path)
 
+@cache_json_result(prefix="performance", ttl=3600)  # Cache for 1 hour, served as JSON bytes
 def compare_crew_performance(query: str, file_path: str) -> Dict[str, Any]:
     """Compare performance of different crew implementations"""
     performance_results = {}
@@ -839,7 +986,7 @@ def compare_crew_performance(query: str, file_path: str) -> Dict[str, Any]:
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    db_info = get_database_manager().get_database_info()
+    db_info = db_manager.get_database_info()
     return {
         "message": "Financial Document Analyzer API is running",
         "status": "healthy",
@@ -851,7 +998,13 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    db_healthy = get_database_manager().health_check()
+    # Run both blocking DB probes in the default executor so they overlap;
+    # db_manager is resolved once at startup rather than per probe
+    loop = asyncio.get_running_loop()
+    db_healthy, db_info = await asyncio.gather(
+        loop.run_in_executor(None, db_manager.health_check),
+        loop.run_in_executor(None, db_manager.get_database_info)
+    )
     return {
         "status": "healthy" if db_healthy else "degraded",
         "services": {
@@ -860,7 +1013,7 @@ async def health_check():
             "file_upload": "available",
             "ai_analysis": "available"
         },
-        "database_info": get_database_manager().get_database_info()
+        "database_info": db_info
     }
 
 
@@ -868,237 +1021,201 @@ async def health_check():
 # AUTHENTICATION ROUTES
 # =============================================================================
 
-@app.post("/auth/register", response_model=TokenResponse)
+@app.post(
+    "/auth/register",
+    response_model=TokenResponse,
+    dependencies=[Depends(rate_limit("register", limit=3, window_seconds=3600))]
+)
 async def register_user(
     user_data: UserRegisterRequest,
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Register a new user"""
-    try:
-        user, error = auth_service.register_user(session, user_data)
-        if error:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error
-            )
-        
-        session.commit()
-        
-        # Create access token for the new user
-        token_response = auth_service.create_access_token(user)
-        
-        logger.info(f"User registered successfully: {user.email}")
-        return token_response
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Registration error: {e}")
+    user, error = await auth_service.register_user_async(session, user_data)
+    if error:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Registration failed"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
         )
+    
+    # Defaults are client-side, so the flushed user is fully populated; the
+    # request-scoped session commits once the handler returns
+    # Create access token for the new user
+    token_response = auth_service.create_access_token(user)
+    
+    logger.debug("User registered successfully: %s", user.email)
+    return token_response
 
-@app.post("/auth/login", response_model=TokenResponse)
+@app.post(
+    "/auth/login",
+    responses={200: {"model": TokenResponse}},
+    dependencies=[Depends(rate_limit("login", limit=5, window_seconds=900))]
+)
 async def login_user(
     login_data: UserLoginRequest,
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Authenticate user and return access token"""
-    try:
-        user, error = auth_service.authenticate_user(
-            session, login_data.email, login_data.password
-        )
-        
-        if error:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=error
-            )
-        
-        # Create access token
-        token_response = auth_service.create_access_token(user)
-        
-        logger.info(f"User logged in successfully: {user.email}")
-        return token_response
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Login error: {e}")
+    user, error = await auth_service.authenticate_user_async(
+        session, login_data.email, login_data.password
+    )
+    
+    if error:
+        # get_async_db_session rolls back on errors; keep the failed-attempt count
+        await session.commit()
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Login failed"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=error
         )
+    
+    # Create access token
+    token_response = auth_service.create_access_token(user)
+    
+    logger.debug("User logged in successfully: %s", user.email)
+    # Already built from validated models; skip response_model re-validation
+    return ORJSONResponse(token_response.model_dump())
 
 @app.post("/auth/logout")
 async def logout_user(current_user: UserResponse = Depends(get_current_user)):
     """Logout user (client should discard token)"""
-    try:
-        logger.info(f"User logged out: {current_user.email}")
-        return {"message": "Successfully logged out"}
-        
-    except Exception as e:
-        logger.error(f"Logout error: {e}")
-        return {"message": "Logged out"}
+    logger.debug("User logged out: %s", current_user.email)
+    return Response(content=LOGOUT_OK_BODY, media_type="application/json")
 
-@app.get("/auth/me", response_model=UserResponse)
+@app.get("/auth/me", responses={200: {"model": UserResponse}})
 async def get_current_user_profile(current_user: UserResponse = Depends(get_current_user)):
     """Get current user profile"""
-    return current_user
+    return ORJSONResponse(UserResponse.model_validate(current_user).model_dump())
 
 @app.put("/auth/profile", response_model=UserResponse)
 async def update_user_profile(
     profile_update: UserProfileUpdate,
     current_user: UserResponse = Depends(get_current_user),
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Update user profile"""
-    try:
-        # Get the actual user object from database
-        user = session.query(User).filter(User.id == current_user.id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        # Update profile fields
-        if profile_update.first_name is not None:
-            user.first_name = profile_update.first_name
-        if profile_update.last_name is not None:
-            user.last_name = profile_update.last_name
-        if profile_update.email is not None:
-            # Check if email is already taken
-            existing_user = session.query(User).filter(
+    # Get the actual user object from database
+    # Primary-key lookup hits the identity map populated by get_current_user
+    user = await session.get(User, current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    # Update profile fields
+    if profile_update.first_name is not None:
+        user.first_name = profile_update.first_name
+    if profile_update.last_name is not None:
+        user.last_name = profile_update.last_name
+    if profile_update.email is not None:
+        # Check if email is already taken (SELECT EXISTS on the unique email index)
+        email_taken = await session.scalar(
+            select(exists().where(
                 User.email == profile_update.email,
                 User.id != user.id
-            ).first()
-            if existing_user:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already taken"
-                )
-            user.email = profile_update.email
-        
-        session.commit()
-        
-        # Return updated user response
-        updated_user = UserResponse(
-            id=user.id,
-            email=user.email,
-            username=user.username,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            full_name=user.full_name,
-            is_active=user.is_active,
-            created_at=user.created_at,
-            last_activity=user.last_activity,
-            last_login=user.last_login
-        )
-        
-        logger.info(f"Profile updated for user: {user.email}")
-        return updated_user
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Profile update error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to update profile"
+            ))
         )
+        if email_taken:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already taken"
+            )
+        user.email = profile_update.email
+    
+    # Flush now so the onupdate timestamp is set on the instance for the response
+    # (commit happens at the end of the request)
+    await session.flush()
+    
+    # Return updated user response
+    updated_user = UserResponse.model_validate(user)
+    
+    logger.debug("Profile updated for user: %s", user.email)
+    return updated_user
 
 @app.post("/auth/change-password")
 async def change_password(
     password_change: PasswordChangeRequest,
     current_user: UserResponse = Depends(get_current_user),
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Change user password"""
-    try:
-        # Get the actual user object from database
-        user = session.query(User).filter(User.id == current_user.id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found"
-            )
-        
-        success, error = auth_service.change_password(session, user, password_change)
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error
-            )
-        
-        logger.info(f"Password changed for user: {user.email}")
-        return {"message": "Password changed successfully"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Password change error: {e}")
+    # Get the actual user object from database
+    # Primary-key lookup hits the identity map populated by get_current_user
+    user = await session.get(User, current_user.id)
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to change password"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    success, error = await auth_service.change_password_async(session, user, password_change)
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
         )
+    
+    logger.debug("Password changed for user: %s", user.email)
+    return Response(content=PASSWORD_CHANGED_BODY, media_type="application/json")
 
-@app.post("/auth/forgot-password")
+@app.post(
+    "/auth/forgot-password",
+    dependencies=[Depends(rate_limit("forgot_password", limit=3, window_seconds=3600))]
+)
 async def forgot_password(
     reset_request: PasswordResetRequest,
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Request password reset"""
+    # Both the hit and the miss path are padded to the same minimum duration so
+    # response timing does not reveal whether the email is registered
+    start_time = time.monotonic()
+    loop = asyncio.get_running_loop()
+    response = Response(content=PASSWORD_RESET_REQUESTED_BODY, media_type="application/json")
+    
     try:
-        success, token = auth_service.generate_password_reset_token(
-            session, reset_request.email
+        success, token = await session.run_sync(
+            auth_service.generate_password_reset_token, reset_request.email
         )
         
         if not success:
-            # Return success even if email not found for security
-            return {"message": "If the email exists, a reset link has been sent"}
-        
-        # In a real application, you would send an email here
-        # For now, we'll log the token (in production, this should be sent via email)
-        logger.info(f"Password reset token generated: {token}")
-        
-        return {
-            "message": "If the email exists, a reset link has been sent",
-            "token": token  # Remove this in production!
-        }
+            # Do equivalent token work on the miss path as well
+            await loop.run_in_executor(None, secrets.token_urlsafe, 32)
+        else:
+            # In a real application, you would send an email here
+            # For now, we'll log the token (in production, this should be sent via email)
+            logger.info(f"Password reset token generated: {token}")
+            response = ORJSONResponse({
+                "message": "If the email exists, a reset link has been sent",
+                "token": token  # Remove this in production!
+            })
         
     except Exception as e:
         logger.error(f"Password reset request error: {e}")
-        return {"message": "If the email exists, a reset link has been sent"}
+    
+    remaining = FORGOT_PASSWORD_MIN_RESPONSE_SECONDS - (time.monotonic() - start_time)
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+    
+    return response
 
 @app.post("/auth/reset-password")
 async def reset_password(
     reset_confirm: PasswordResetConfirm,
-    session: Session = Depends(get_db_session)
+    session: AsyncSession = Depends(get_async_db_session)
 ):
     """Reset password using token"""
-    try:
-        success, error = auth_service.reset_password(
-            session, reset_confirm.token, reset_confirm.new_password
-        )
-        
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=error
-            )
-        
-        return {"message": "Password reset successfully"}
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Password reset error: {e}")
+    success, error = await auth_service.reset_password_async(
+        session, reset_confirm.token, reset_confirm.new_password
+    )
+    
+    if not success:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to reset password"
+            detail=error
         )
+    
+    return Response(content=PASSWORD_RESET_OK_BODY, media_type="application/json")
 
 # =============================================================================
 # END AUTHENTICATION ROUTES
@@ -1132,59 +1249,45 @@ async def analyze_document_endpoint(
         if not is_valid:
             raise HTTPException(status_code=400, detail=validation_msg)
         
-        # Read file content and check size
-        content = await file.read()
-        file_size = len(content)
-        
-        if file_size == 0:
+        # Read only the header up front; the rest is copied straight to disk
+        header = await file.read(MIME_SNIFF_BYTES)
+        if not header:
             raise HTTPException(status_code=400, detail="File is empty")
         
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413, 
-                detail=f"File too large. Max size: {MAX_FILE_SIZE//1024//1024}MB, got: {file_size//1024//1024}MB"
-            )
-        
-        # Validate file type using python-magic (more reliable than extension)
-        try:
-            file_mime = magic.from_buffer(content, mime=True)
+        # Validate file type from the header only; a "%PDF-" signature is accepted
+        # directly and python-magic (more reliable than extension) sniffs the rest
+        if not header.startswith(b"%PDF-") and MIME_DETECTOR is not None:
+            try:
+                file_mime = MIME_DETECTOR.from_buffer(header)
+            except Exception as e:
+                # Fall back to the extension check already done above
+                logger.warning(f"python-magic failed, using extension-based validation: {e}")
+                file_mime = 'application/pdf'
             if file_mime != 'application/pdf':
                 raise HTTPException(
                     status_code=400, 
                     detail=f"Invalid file format. Expected PDF, got: {file_mime}"
                 )
-        except:
-            # Fallback if python-magic is not available
-            logger.warning("python-magic not available, using extension-based validation")
-        
-        # Ensure upload directory exists
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
         
         # Generate unique filename
-        file_id = str(uuid.uuid4())
+        file_id = secrets.token_hex(16)  # 32 hex chars straight from os.urandom
         stored_filename = f"financial_document_{file_id}.pdf"
-        file_path = os.path.join(UPLOAD_DIR, stored_filename)
+        file_path = str(UPLOAD_PATH / stored_filename)
         
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            f.write(content)
+        # Copy the spooled upload to disk in one threadpool hop, hashing and enforcing the size limit as we go
+        await file.seek(0)
+        file_size, file_hash = await asyncio.get_running_loop().run_in_executor(
+            None, save_upload, file.file, file_path, MAX_FILE_SIZE
+        )
         
-        logger.info(f"File saved: {file_path}, size: {file_size} bytes")
+        if file_size > MAX_FILE_SIZE:
+            os.remove(file_path)
+            raise HTTPException(
+                status_code=413, 
+                detail=f"File too large. Max size: {MAX_FILE_SIZE//1024//1024}MB"
+            )
         
-        # Create document record in database
-        document = DocumentService.create_document(
-            session=session,
-            user_id=user_id,
-            original_filename=file.filename,
-            stored_filename=stored_filename,
-            file_path=file_path if (keep_file or KEEP_UPLOADED_FILES) else None,
-            file_size=file_size,
-            file_type="PDF",
-            mime_type=file_mime if 'file_mime' in locals() else "application/pdf",
-            file_content=content
-        )
-        document_id = document.id
-        session.commit()
+        logger.info(f"File saved: {file_path}, size: {file_size} bytes")
         
         # Validate and sanitize query
         if not query or not query.strip():
@@ -1193,34 +1296,27 @@ async def analyze_document_endpoint(
         # Limit query length to prevent abuse
         query = query.strip()[:1000]  # Max 1000 characters
         
-        # Create analysis record
-        analysis = AnalysisService.create_analysis(
-            session=session,
-            user_id=user_id,
-            document_id=document_id,
-            query=query,
-            analysis_type="comprehensive"
-        )
-        analysis_id = analysis.id
-        session.commit()
-        
-        # Log analysis creation
-        AnalysisHistoryService.log_action(
-            session=session,
-            analysis_id=analysis_id,
-            action="created",
-            user_id=user_id,
-            details=f"Analysis started for file: {file.filename}",
-            ip_address=get_client_info(request)['ip_address']
+        # Write the document, analysis and history rows in the threadpool so a slow
+        # database never stalls the event loop (the sync session would block it)
+        document_id, analysis_id = await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                record_analysis_request,
+                session=session,
+                user_id=user_id,
+                original_filename=file.filename,
+                stored_filename=stored_filename,
+                file_path=file_path if (keep_file or KEEP_UPLOADED_FILES) else None,
+                file_size=file_size,
+                mime_type=file_mime if 'file_mime' in locals() else "application/pdf",
+                file_hash=file_hash,
+                query=query,
+                ip_address=get_client_info(request)['ip_address']
+            )
         )
-        session.commit()
         
         logger.info(f"Starting analysis {analysis_id} for file: {file.filename}")
         
-        # Update analysis status to processing
-        AnalysisService.update_analysis_status(session, analysis_id, "processing")
-        session.commit()
-        
         # Add the analysis task to background tasks
         background_tasks.add_task(
             process_analysis_background,
@@ -1233,6 +1329,7 @@ async def analyze_document_endpoint(
         )
         
         # Return immediately with analysis ID for polling
+        processed_at = datetime.now(timezone.utc).isoformat()
         return {
             "status": "processing",
             "analysis_id": analysis_id,
@@ -1241,14 +1338,14 @@ async def analyze_document_endpoint(
             "file_info": {
                 "filename": file.filename,
                 "size_mb": round(file_size / 1024 / 1024, 2),
-                "processed_at": datetime.utcnow().isoformat()
+                "processed_at": processed_at
             },
             "query": query,
             "message": "Analysis started. Please poll the /analysis/{analysis_id}/status endpoint for progress.",
             "metadata": {
                 "processing_id": file_id,
                 "file_type": "PDF",
-                "analysis_timestamp": datetime.utcnow().isoformat(),
+                "analysis_timestamp": processed_at,
                 "kept_file": keep_file or KEEP_UPLOADED_FILES
             }
         }
@@ -1289,7 +1386,59 @@ async def analyze_document_endpoint(
         # Cleanup will be handled in the background task
         pass
 
-def process_analysis_background(
+def record_analysis_request(
+    session: Session,
+    user_id: str,
+    original_filename: str,
+    stored_filename: str,
+    file_path: Optional[str],
+    file_size: int,
+    mime_type: str,
+    file_hash: bytes,
+    query: str,
+    ip_address: str
+) -> tuple[str, str]:
+    """Create the document, analysis and history rows for an upload in one commit; returns (document_id, analysis_id)"""
+    # Create document record in database
+    document = DocumentService.create_document(
+        session=session,
+        user_id=user_id,
+        original_filename=original_filename,
+        stored_filename=stored_filename,
+        file_path=file_path,
+        file_size=file_size,
+        file_type="PDF",
+        mime_type=mime_type,
+        file_hash=file_hash
+    )
+    
+    # Create analysis record, inserted directly in the processing state
+    # (saves a SELECT + UPDATE round trip versus a separate status change)
+    analysis = AnalysisService.create_analysis(
+        session=session,
+        user_id=user_id,
+        document_id=document.id,
+        query=query,
+        analysis_type="comprehensive",
+        status="processing"
+    )
+    
+    # Log analysis creation
+    AnalysisHistoryService.log_action(
+        session=session,
+        analysis_id=analysis.id,
+        action="created",
+        user_id=user_id,
+        details=f"Analysis started for file: {original_filename}",
+        ip_address=ip_address
+    )
+    
+    # The service calls above only flush; commit document, analysis and history
+    # together before the background task opens its own session
+    session.commit()
+    return document.id, analysis.id
+
+async def process_analysis_background(
     analysis_id: str,
     document_id: str,
     query: str,
@@ -1297,36 +1446,83 @@ def process_analysis_background(
     user_id: str,
     keep_file: bool
 ):
-    """Process the analysis in the background using a separate thread to avoid blocking"""
-    # Create a new database session for the background task
-    from backend.core.database import db_manager
-    if not db_manager:
-        from backend.core.database import init_database
-        db_manager = init_database()
+    """Process the analysis in the background without holding a threadpool worker while CrewAI runs"""
+    loop = asyncio.get_running_loop()
+    analysis_result = None
+    analysis_error = None
+    started = loop.create_future()
     
+    def run_analysis():
+        loop.call_soon_threadsafe(started.set_result, None)
+        return run_crew_with_mode(query=query, file_path=file_path, use_enhanced=True)
+    
+    logger.info(f"Queueing CrewAI analysis {analysis_id} on the analysis pool")
+    try:
+        future = loop.run_in_executor(ANALYSIS_EXECUTOR, run_analysis)
+        # The timeout counts from when a worker picks the job up, not from queueing
+        await asyncio.wait({started, future}, return_when=asyncio.FIRST_COMPLETED)
+        done, _ = await asyncio.wait({future}, timeout=ANALYSIS_TIMEOUT)
+        if not done:
+            # The worker thread cannot be interrupted: report the timeout now, and let the
+            # real outcome overwrite it if the crew run ever returns
+            logger.warning(f"Analysis {analysis_id} still running after {ANALYSIS_TIMEOUT}s")
+            await loop.run_in_executor(None, mark_analysis_timed_out, analysis_id)
+        analysis_result = await future
+    except Exception as e:
+        analysis_error = e
+    
+    # Recording the outcome uses a blocking DB session, so keep it off the event loop
+    await loop.run_in_executor(
+        None,
+        functools.partial(
+            finish_analysis_background,
+            analysis_id=analysis_id,
+            document_id=document_id,
+            file_path=file_path,
+            user_id=user_id,
+            keep_file=keep_file,
+            analysis_result=analysis_result,
+            analysis_error=analysis_error
+        )
+    )
+
+def mark_analysis_timed_out(analysis_id: str):
+    """Mark an analysis whose crew run overran ANALYSIS_TIMEOUT as failed"""
     session = db_manager.get_session()
     try:
-        # Run the CrewAI analysis in a separate thread to avoid blocking
-        import concurrent.futures
-        import threading
-        
-        logger.info(f"Starting CrewAI analysis in thread: {threading.current_thread().name}")
-        
-        # Use a thread pool executor to run the CPU-intensive CrewAI task
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(run_crew_with_mode, query=query, file_path=file_path, use_enhanced=True)
-            # Wait for completion with a timeout (increased to 15 minutes for complex financial analysis)
-            analysis_result = future.result(timeout=900)  # 15 minutes timeout
+        AnalysisService.fail_analysis(session, analysis_id, ANALYSIS_TIMEOUT_MESSAGE)
+        session.commit()
+    except Exception as db_error:
+        logger.error(f"Failed to mark analysis as timed out in database: {db_error}")
+        session.rollback()
+    finally:
+        session.close()
+
+def finish_analysis_background(
+    analysis_id: str,
+    document_id: str,
+    file_path: str,
+    user_id: str,
+    keep_file: bool,
+    analysis_result: Any,
+    analysis_error: Optional[Exception]
+):
+    """Persist the result (or failure) of a background analysis and clean up its file"""
+    # Create a new database session for the background task
+    # (db_manager is initialized when this module is imported)
+    session = db_manager.get_session()
+    try:
+        # Surface a failed or timed-out crew run to the handlers below
+        if analysis_error is not None:
+            raise analysis_error
         
-        logger.info(f"CrewAI analysis completed in thread: {threading.current_thread().name}")
-        # Convert CrewOutput to string before getting length
+        logger.info(f"CrewAI analysis {analysis_id} completed")
+        # Convert CrewOutput to string once; it is both logged and stored
         result_str = str(analysis_result)
-        logger.info(f"CrewAI result length: {len(result_str)}")
+        logger.info("CrewAI result length: %d", len(result_str))
         
         # Complete the analysis - with better error handling
         logger.info("Calling AnalysisService.complete_analysis")
-        # Convert CrewOutput to string before passing to complete_analysis
-        result_str = str(analysis_result)
         completion_success = AnalysisService.complete_analysis(
             session=session,
             analysis_id=analysis_id,
@@ -1374,29 +1570,14 @@ def process_analysis_background(
         logger.error(f"Analysis {analysis_id} timed out")
         # Mark analysis as failed due to timeout
         try:
-            AnalysisService.fail_analysis(session, analysis_id, "Analysis timed out after 10 minutes")
+            AnalysisService.fail_analysis(session, analysis_id, ANALYSIS_TIMEOUT_MESSAGE)
             session.commit()
         except Exception as db_error:
             logger.error(f"Failed to mark analysis as failed in database: {db_error}")
     except Exception as e:
         logger.error(f"Error in background analysis processing: {e}")
-        error_message = str(e)
-        
         # Make error messages more user-friendly
-        if "insufficient_quota" in error_message or "429" in error_message:
-            error_message = "OpenAI API quota exceeded. Please check your OpenAI plan and billing details. For more information, visit https://platform.openai.com/docs/guides/error-codes/api-errors"
-        elif "rate limit" in error_message.lower():
-            error_message = "API rate limit exceeded. Please try again later."
-        elif "timeout" in error_message.lower():
-            error_message = "Request timed out. Please try again with a simpler query or check your network connection."
-        elif "authentication" in error_message.lower() or "unauthorized" in error_message.lower():
-            error_message = "Authentication failed. Please check your API credentials."
-        elif "permission" in error_message.lower() or "forbidden" in error_message.lower():
-            error_message = "Access forbidden. Please check your permissions."
-        elif "not found" in error_message.lower():
-            error_message = "Resource not found. The requested resource may have been deleted."
-        elif "network" in error_message.lower() or "connection" in error_message.lower():
-            error_message = "Network error. Please check your internet connection and try again."
+        error_message = classify_analysis_error(str(e))
         
         # Mark analysis as failed
         try:
@@ -1405,21 +1586,23 @@ def process_analysis_background(
         except Exception as db_error:
             logger.error(f"Failed to mark analysis as failed in database: {db_error}")
     finally:
-        # Clean up uploaded file if not keeping it
-        if file_path and os.path.exists(file_path):
-            if not (keep_file or KEEP_UPLOADED_FILES):
-                try:
-                    os.remove(file_path)
-                    logger.info(f"Cleaned up temporary file: {file_path}")
-                except Exception as cleanup_error:
-                    logger.warning(f"Failed to cleanup file {file_path}: {cleanup_error}")
-            else:
-                # Update document to reflect persistent storage
-                try:
-                    DocumentService.set_document_persistent_storage(session, document_id, True)
-                    session.commit()
-                except Exception as storage_error:
-                    logger.warning(f"Failed to update document storage status: {storage_error}")
+        # Clean up uploaded file if not keeping it (one unlink, no separate exists() probe).
+        # This whole function runs in the default executor, so the syscalls stay off the event loop
+        if file_path and not (keep_file or KEEP_UPLOADED_FILES):
+            try:
+                os.remove(file_path)
+                logger.info(f"Cleaned up temporary file: {file_path}")
+            except FileNotFoundError:
+                pass
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to cleanup file {file_path}: {cleanup_error}")
+        elif file_path and os.path.exists(file_path):
+            # Update document to reflect persistent storage
+            try:
+                DocumentService.set_document_persistent_storage(session, document_id, True)
+                session.commit()
+            except Exception as storage_error:
+                logger.warning(f"Failed to update document storage status: {storage_error}")
         
         # Close the database session
         try:
@@ -1427,20 +1610,6 @@ def process_analysis_background(
         except Exception as close_error:
             logger.error(f"Error closing database session: {close_error}")
 
-if __name__ == "__main__":
-    import uvicorn
-    # Add separator to logs when starting the application
-    separator = "=" * 80
-    logger.info(f"\n{separator}\nUvicorn server starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{separator}\n")
-    
-    uvicorn.run(
-        "main:app", 
-        host="0.0.0.0", 
-        port=8000, 
-        reload=True,
-        log_level="info"
-    )
-
 # Additional API endpoints for data retrieval
 
 @app.get("/analysis/history", response_model=dict)
@@ -1469,21 +1638,10 @@ async def get_analysis_history(
         analysis_responses = []
         for analysis in analyses:
             try:
-                # Get document info - make sure we're working with objects attached to the session
-                # If analysis was retrieved from cache, it might be detached, so we re-fetch it to ensure it's attached
-                if analysis not in session:
-                    # Re-fetch analysis to ensure it's attached to session
-                    analysis = session.query(Analysis).filter(Analysis.id == analysis.id).first()
-                
-                # Get document info - make sure document is also attached to session
-                document = DocumentService.get_document_by_id(session, analysis.document_id)
-                if not document or document not in session:
-                    # Re-fetch document to ensure it's attached to session
-                    document = session.query(Document).filter(Document.id == analysis.document_id).first()
-                
-                document_info = DocumentResponse.from_orm(document) if document else None
+                # Documents are selectin-loaded with the page, so this does not hit the database
+                document = analysis.document
                 
-                # Create a dictionary representation instead of using from_orm to avoid issues
+                # Create a dictionary representation instead of validating a full AnalysisResponse
                 analysis_dict = {
                     "id": analysis.id,
                     "user_id": analysis.user_id,
@@ -1499,7 +1657,7 @@ async def get_analysis_history(
                     "status": analysis.status,
                     "confidence_score": analysis.confidence_score,
                     "key_insights_count": analysis.key_insights_count,
-                    "document": document_info.model_dump() if document_info else None
+                    "document": DocumentResponse.model_validate(document).model_dump() if document else None
                 }
                 
                 analysis_responses.append(analysis_dict)
@@ -1536,27 +1694,11 @@ async def get_analysis_by_id(
 ):
     """Get specific analysis by ID"""
     try:
-        analysis = AnalysisService.get_analysis_by_id(session, analysis_id)
+        analysis = AnalysisService.get_analysis_by_id(session, analysis_id, with_document=True)
         
         if not analysis:
             raise HTTPException(status_code=404, detail="Analysis not found")
         
-        # Get document info - we need to make sure we're working with objects attached to the session
-        # If analysis was retrieved from cache, it might be detached, so we re-fetch it to ensure it's attached
-        if analysis not in session:
-            # Re-fetch analysis to ensure it's attached to session
-            analysis = session.query(Analysis).filter(Analysis.id == analysis_id).first()
-            if not analysis:
-                raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        # Get document info - make sure document is also attached to session
-        document = DocumentService.get_document_by_id(session, analysis.document_id)
-        if not document or document not in session:
-            # Re-fetch document to ensure it's attached to session
-            document = session.query(Document).filter(Document.id == analysis.document_id).first()
-        
-        document_info = DocumentResponse.from_orm(document) if document else None
-        
         # Log the view action
         user_id = get_or_create_user(session, request)
         AnalysisHistoryService.log_action(
@@ -1568,17 +1710,13 @@ async def get_analysis_by_id(
         )
         session.commit()
         
-        analysis_resp = AnalysisResponse.from_orm(analysis)
-        analysis_resp.document = document_info
-        
-        # Convert to dict and include error_message if present
-        response_dict = analysis_resp.model_dump()
-        if hasattr(analysis, 'error_message') and analysis.error_message:
-            response_dict['error_message'] = analysis.error_message
+        # Validated once from the ORM object; the related document (an identity-map hit
+        # for the already-known foreign key) is serialized as part of it
+        response_dict = AnalysisResponse.model_validate(analysis).model_dump()
             
         return {
             "analysis": response_dict,
-            "document": document_info.model_dump() if document_info else None
+            "document": response_dict["document"]
         }
         
     except HTTPException:
@@ -1605,11 +1743,10 @@ async def get_user_documents(
             page_size=page_size
         )
         
-        document_responses = [DocumentResponse.from_orm(doc) for doc in documents]
         has_more = (page * page_size) < total_count
         
         return {
-            "documents": [resp.model_dump() for resp in document_responses],
+            "documents": documents,
             "pagination": {
                 "page": page,
                 "page_size": page_size,
@@ -1643,11 +1780,10 @@ async def search_user_documents(
             page_size=page_size
         )
         
-        document_responses = [DocumentResponse.from_orm(doc) for doc in documents]
         has_more = (page * page_size) < total_count
         
         return {
-            "documents": [resp.model_dump() for resp in document_responses],
+            "documents": documents,
             "pagination": {
                 "page": page,
                 "page_size": page_size,
@@ -1669,8 +1805,6 @@ async def classify_document(
 ):
     """Classify a financial document by type and industry"""
     try:
-        from tools import financial_document_tool, document_classifier_tool
-        
         # Read the document
         document_content = financial_document_tool._run(file_path)
         
@@ -1775,7 +1909,6 @@ async def get_agent_performance():
     """Get performance metrics for all agents/crews"""
     try:
         # Get performance metrics from agents.py
-        from backend.core.agents import get_agent_performance_summary
         agent_summary = get_agent_performance_summary()
         
         # Get performance metrics from main.py (crew level)
@@ -1807,8 +1940,6 @@ async def get_agent_performance():
 async def get_tool_performance():
     """Get performance metrics for all tools"""
     try:
-        from backend.utils.tools import get_tool_performance_summary
-
         summary = get_tool_performance_summary()
         return {
             "tool_performance": summary,
@@ -1827,11 +1958,9 @@ async def performance_dashboard():
     """Get a comprehensive performance dashboard"""
     try:
         # Get agent performance metrics
-        from backend.core.agents import get_agent_performance_summary, llm_observability
         agent_summary = get_agent_performance_summary()
         
         # Get tool performance metrics
-        from backend.utils.tools import get_tool_performance_summary
         tool_summary = get_tool_performance_summary()
         
         # Get LLM metrics
@@ -1867,7 +1996,7 @@ async def performance_dashboard():
         }
 
 @app.get("/statistics", response_model=dict)
-async def get_analysis_statistics(
+def get_analysis_statistics(
     request: Request,
     session: Session = Depends(get_db_session)
 ):
@@ -1884,45 +2013,45 @@ async def get_analysis_statistics(
         return {
             "user_statistics": user_stats,
             "system_statistics": system_stats,
-            "database_info": get_database_manager().get_database_info()
+            "database_info": db_manager.get_database_info()
         }
         
     except Exception as e:
         logger.error(f"Error getting statistics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Progress percentage reported for each analysis status
+ANALYSIS_PROGRESS = {
+    "pending": 0,
+    "processing": 50,
+    "completed": 100,
+    "failed": 100
+}
+
 @app.post("/analysis/{analysis_id}/status")
-async def get_analysis_status(
+def get_analysis_status(
     analysis_id: str,
     session: Session = Depends(get_db_session)
 ):
     """Get the current status of an analysis (useful for polling during processing)"""
     try:
-        analysis = AnalysisService.get_analysis_by_id(session, analysis_id)
+        # Only column attributes are read here; raiseload guards against accidental lazy loads
+        analysis = session.get(Analysis, analysis_id, options=[raiseload("*")])
         
         if not analysis:
             logger.warning(f"Analysis not found: {analysis_id}")  # Log as warning instead of error for missing analyses
             raise HTTPException(status_code=404, detail="Analysis not found")
         
-        # Calculate progress percentage based on status
-        progress_map = {
-            "pending": 0,
-            "processing": 50,
-            "completed": 100,
-            "failed": 100
-        }
-        
-        status_response = AnalysisStatusResponse(
-            status=analysis.status,
-            message=f"Analysis is {analysis.status}",
-            analysis_id=analysis_id,
-            progress_percentage=progress_map.get(analysis.status, 0)
-        )
-        
         # Only log at debug level for successful status checks to reduce log clutter
         logger.debug(f"Status check for analysis {analysis_id}: {analysis.status}")
         
-        return status_response.model_dump()
+        # Same shape as AnalysisStatusResponse, built directly since every field is already typed
+        return {
+            "status": analysis.status,
+            "message": f"Analysis is {analysis.status}",
+            "analysis_id": analysis_id,
+            "progress_percentage": ANALYSIS_PROGRESS.get(analysis.status, 0)
+        }
         
     except HTTPException:
         raise
@@ -1935,7 +2064,7 @@ from backend.utils.file_manager import get_file_manager
 
 
 @app.post("/admin/maintenance")
-async def run_maintenance(session: Session = Depends(get_db_session)):
+def run_maintenance(session: Session = Depends(get_db_session)):
     """Run file system maintenance (admin only)"""
     try:
         file_manager = get_file_manager()
@@ -1944,7 +2073,7 @@ async def run_maintenance(session: Session = Depends(get_db_session)):
         return {
             "status": "success",
             "maintenance_results": results,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
     except Exception as e:
@@ -1952,7 +2081,7 @@ async def run_maintenance(session: Session = Depends(get_db_session)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/admin/storage-stats")
-async def get_storage_statistics():
+def get_storage_statistics():
     """Get storage usage statistics"""
     try:
         file_manager = get_file_manager()
@@ -1960,7 +2089,7 @@ async def get_storage_statistics():
         
         return {
             "storage_statistics": stats,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
     except Exception as e:
@@ -1968,16 +2097,20 @@ async def get_storage_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/performance/compare", response_model=dict)
-async def compare_performance(
+def compare_performance(
     query: str = "Performance comparison test",
     file_path: str = "test_file_path.pdf",
+    force: bool = False,
     session: Session = Depends(get_db_session)
 ):
-    """Compare performance of different crew implementations"""
+    """Compare performance of different crew implementations (cached; force=true re-runs)"""
     try:
         logger.info(f"Performance comparison requested for query: {query}")
-        results = compare_crew_performance(query, file_path)
-        return results
+        if force:
+            # Drop the cached comparison so the crews are run again
+            compare_crew_performance.invalidate(query, file_path)
+        # Already a JSON response (encoded once, then served from the cached bytes)
+        return compare_crew_performance(query, file_path)
     except Exception as e:
         logger.error(f"Performance comparison error: {e}")
         raise HTTPException(
@@ -1986,12 +2119,11 @@ async def compare_performance(
         )
 
 # Export functionality
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-import html
 
 @app.get("/analysis/{analysis_id}/export")
-async def export_analysis_report(
+def export_analysis_report(
     analysis_id: str,
     format: str = "html",
     session: Session = Depends(get_db_session),
@@ -1999,33 +2131,28 @@ async def export_analysis_report(
 ):
     """Export analysis report in various formats"""
     try:
-        # Get the analysis with the related document using a join to ensure document is loaded
-        analysis = session.query(Analysis)\
-                         .filter(Analysis.id == analysis_id)\
-                         .first()
+        # Fetch only the columns the report reads, with the document filename joined in
+        # (LEFT OUTER JOIN), as a plain row instead of hydrating ORM objects.
+        # Ownership is part of the WHERE clause, so another user's analysis is a 404
+        # and its existence is not revealed
+        analysis = session.execute(
+            select(
+                Analysis.id, Analysis.result, Analysis.status,
+                Analysis.query, Analysis.started_at, Document.original_filename
+            )
+            .outerjoin(Document, Document.id == Analysis.document_id)
+            .where(Analysis.id == analysis_id, Analysis.user_id == current_user.id)
+        ).first()
         
         if not analysis:
             raise HTTPException(status_code=404, detail="Analysis not found")
         
-        # Check if analysis object is valid
-        if not hasattr(analysis, 'id'):
-            raise HTTPException(status_code=500, detail="Invalid analysis object retrieved from database")
-        
-        # Check if user has access to this analysis
-        if analysis.user_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Access denied. You do not have permission to download this report.")
-        
-        # Get the document associated with this analysis
-        document = session.query(Document)\
-                         .filter(Document.id == analysis.document_id)\
-                         .first()
-        
-        # Generate report content
-        report_html = generate_analysis_report_html(analysis, document)
-        
         if format == "html":
-            response = Response(
-                content=report_html,
+            # Resolve the fields while the session is open, then stream the rendered
+            # template chunk by chunk instead of materializing the whole page
+            context = build_report_context(analysis, analysis.original_filename)
+            response = StreamingResponse(
+                _REPORT_TEMPLATE.generate(**context),
                 media_type="text/html",
                 headers={
                     "Content-Disposition": f"attachment; filename*=UTF-8''analysis_report_{analysis_id}.html"
@@ -2042,19 +2169,9 @@ async def export_analysis_report(
         logger.error(f"Error exporting analysis {analysis_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to generate report. Please try again later.")
 
-def generate_analysis_report_html(analysis, document=None) -> str:
-    """Generate HTML report for analysis"""
-    try:
-        # Format the analysis result for display
-        result_content = html.escape(str(analysis.result)) if analysis and analysis.result else "No analysis results available."
-        
-        # Get the original filename from the related document
-        original_filename = document.original_filename if document and document.original_filename else "Unknown Document"
-        
-        # Format the created date
-        created_at_str = analysis.started_at.strftime('%Y-%m-%d %H:%M:%S UTC') if analysis and analysis.started_at else "Unknown Date"
-        
-        html_template = f"""
+# Static HTML/CSS shell of exported reports, compiled once at import.
+# Autoescaping covers every substituted field (filename, query, LLM output)
+REPORT_TEMPLATE_SOURCE = """
         <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -2062,60 +2179,60 @@ def generate_analysis_report_html(analysis, document=None) -> str:
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Financial Analysis Report</title>
         <style>
-            body {{
+            body {
                 font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
                 line-height: 1.6;
                 margin: 0;
                 padding: 20px;
                 background-color: #f5f5f5;
-            }}
-            .report-container {{
+            }
+            .report-container {
                 max-width: 800px;
                 margin: 0 auto;
                 background: white;
                 padding: 30px;
                 border-radius: 8px;
                 box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .header {{
+            }
+            .header {
                 text-align: center;
                 margin-bottom: 30px;
                 padding-bottom: 20px;
                 border-bottom: 2px solid #e0e0e0;
-            }}
-            .header h1 {{
+            }
+            .header h1 {
                 color: #2c3e50;
                 margin-bottom: 10px;
-            }}
-            .header p {{
+            }
+            .header p {
                 color: #7f8c8d;
                 margin: 5px 0;
-            }}
-            .section {{
+            }
+            .section {
                 margin-bottom: 25px;
-            }}
-            .section h2 {{
+            }
+            .section h2 {
                 color: #34495e;
                 border-left: 4px solid #3498db;
                 padding-left: 15px;
                 margin-bottom: 15px;
-            }}
-            .meta-info {{
+            }
+            .meta-info {
                 background: #f8f9fa;
                 padding: 15px;
                 border-radius: 5px;
                 margin-bottom: 20px;
-            }}
-            .meta-row {{
+            }
+            .meta-row {
                 display: flex;
                 justify-content: space-between;
                 margin-bottom: 8px;
-            }}
-            .meta-label {{
+            }
+            .meta-label {
                 font-weight: bold;
                 color: #555;
-            }}
-            .analysis-content {{
+            }
+            .analysis-content {
                 background: #fff;
                 border: 1px solid #e0e0e0;
                 border-radius: 5px;
@@ -2124,15 +2241,15 @@ def generate_analysis_report_html(analysis, document=None) -> str:
                 font-family: 'Courier New', monospace;
                 font-size: 14px;
                 line-height: 1.5;
-            }}
-            .footer {{
+            }
+            .footer {
                 text-align: center;
                 margin-top: 30px;
                 padding-top: 20px;
                 border-top: 1px solid #e0e0e0;
                 color: #7f8c8d;
                 font-size: 12px;
-            }}
+            }
         </style>
     </head>
     <body>
@@ -2140,7 +2257,7 @@ def generate_analysis_report_html(analysis, document=None) -> str:
             <div class="header">
                 <h1>Financial Analysis Report</h1>
                 <p>Generated by Financial Document Analyzer</p>
-                <p>Report ID: {analysis.id}</p>
+                <p>Report ID: {{ report_id }}</p>
             </div>
             
             <div class="section">
@@ -2148,21 +2265,21 @@ def generate_analysis_report_html(analysis, document=None) -> str:
                 <div class="meta-info">
                     <div class="meta-row">
                         <span class="meta-label">Document:</span>
-                        <span>{html.escape(original_filename)}</span>
+                        <span>{{ filename }}</span>
                     </div>
                     <div class="meta-row">
                         <span class="meta-label">Analysis Date:</span>
-                        <span>{created_at_str}</span>
+                        <span>{{ created_at }}</span>
                     </div>
                     <div class="meta-row">
                         <span class="meta-label">Status:</span>
-                        <span style="color: {'green' if analysis.status == 'completed' else 'orange'};">
-                            {analysis.status.title() if analysis.status else 'Unknown'}
+                        <span style="color: {{ 'green' if status == 'completed' else 'orange' }};">
+                            {{ status.title() if status else 'Unknown' }}
                         </span>
                     </div>
                     <div class="meta-row">
                         <span class="meta-label">Query:</span>
-                        <span>{html.escape(analysis.query or 'General financial analysis')}</span>
+                        <span>{{ query or 'General financial analysis' }}</span>
                     </div>
                 </div>
             </div>
@@ -2170,24 +2287,19 @@ def generate_analysis_report_html(analysis, document=None) -> str:
             <div class="section">
                 <h2>Analysis Results</h2>
                 <div class="analysis-content">
-{result_content}
+{% for part in result_parts %}{{ part }}{% endfor %}
                 </div>
             </div>
             
             <div class="footer">
                 <p>This report was generated automatically by the Financial Document Analyzer.</p>
-                <p>Generated on: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}</p>
+                <p>Generated on: {{ generated_at }}</p>
             </div>
         </div>
     </body>
     </html>
     """
-    
-        return html_template
-    except Exception as e:
-        logger.error(f"Error generating HTML report: {e}", exc_info=True)
-        # Return a simple error report
-        error_template = f"""
+ERROR_REPORT_TEMPLATE_SOURCE = """
         <!DOCTYPE html>
         <html>
         <head>
@@ -2195,12 +2307,54 @@ def generate_analysis_report_html(analysis, document=None) -> str:
         </head>
         <body>
             <h1>Error Generating Report</h1>
-            <p>An error occurred while generating the report: {str(e)}</p>
+            <p>An error occurred while generating the report: {{ error }}</p>
             <p>Please try again later.</p>
         </body>
         </html>
         """
-        return error_template
+_REPORT_ENV = jinja2.Environment(autoescape=True)
+_REPORT_TEMPLATE = _REPORT_ENV.from_string(REPORT_TEMPLATE_SOURCE)
+_ERROR_REPORT_TEMPLATE = _REPORT_ENV.from_string(ERROR_REPORT_TEMPLATE_SOURCE)
+
+# Size of the slices the analysis result is escaped and emitted in, so a
+# multi-MB LLM output is never escaped as one giant string
+REPORT_RESULT_CHUNK_SIZE = 64 * 1024
+
+def _iter_result_parts(result_content: str, chunk_size: int = REPORT_RESULT_CHUNK_SIZE):
+    """Yield the analysis result in fixed-size slices"""
+    for start in range(0, len(result_content), chunk_size):
+        yield result_content[start:start + chunk_size]
+
+def build_report_context(analysis, original_filename: str = None) -> dict:
+    """Collect the template fields of an analysis report (an Analysis or a row with its columns)"""
+    # Format the analysis result for display
+    result_content = str(analysis.result) if analysis and analysis.result else "No analysis results available."
+    
+    # Fall back when the related document (or its filename) is missing
+    original_filename = original_filename or "Unknown Document"
+    
+    # Format the created date
+    created_at_str = analysis.started_at.strftime('%Y-%m-%d %H:%M:%S UTC') if analysis and analysis.started_at else "Unknown Date"
+    
+    return {
+        "report_id": analysis.id,
+        "filename": original_filename,
+        "created_at": created_at_str,
+        "status": analysis.status,
+        "query": analysis.query,
+        "result_parts": _iter_result_parts(result_content),
+        "generated_at": datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    }
+
+def generate_analysis_report_html(analysis, document=None) -> str:
+    """Generate HTML report for analysis"""
+    try:
+        original_filename = document.original_filename if document else None
+        return _REPORT_TEMPLATE.render(**build_report_context(analysis, original_filename))
+    except Exception as e:
+        logger.error(f"Error generating HTML report: {e}", exc_info=True)
+        # Return a simple error report
+        return _ERROR_REPORT_TEMPLATE.render(error=str(e))
 
 def save_analysis_report(analysis, document=None) -> str:
     """Generate and save HTML report to output folder"""
@@ -2210,7 +2364,7 @@ def save_analysis_report(analysis, document=None) -> str:
         
         # Create filename
         filename = f"analysis_report_{analysis.id}.html"
-        filepath = os.path.join(OUTPUT_DIR, filename)
+        filepath = str(OUTPUT_PATH / filename)
         
         # Save to file
         with open(filepath, 'w', encoding='utf-8') as f:
@@ -2222,19 +2376,12 @@ def save_analysis_report(analysis, document=None) -> str:
         logger.error(f"Error saving analysis report: {e}", exc_info=True)
         return None
 
-if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
-
 # LLM Observability endpoint
 @app.get("/metrics/llm", response_model=dict)
-async def get_llm_metrics(current_user: User = Depends(get_current_user)):
+def get_llm_metrics(current_user: User = Depends(get_current_user)):
     """Get LLM observability metrics"""
     try:
-        from backend.core.agents import get_llm_metrics
-
-        metrics = get_llm_metrics()
+        metrics = get_agent_llm_metrics()
         
         return {
             "status": "success",
@@ -2250,10 +2397,9 @@ async def get_llm_metrics(current_user: User = Depends(get_current_user)):
 
 # Redis Cache endpoints
 @app.get("/cache/stats", response_model=dict)
-async def get_cache_stats(current_user: User = Depends(get_current_user)):
+def get_cache_stats(current_user: User = Depends(get_current_user)):
     """Get Redis cache statistics"""
     try:
-        from backend.utils.redis_cache import redis_cache
         stats = redis_cache.get_stats()
         
         return {
@@ -2269,15 +2415,13 @@ async def get_cache_stats(current_user: User = Depends(get_current_user)):
         )
 
 @app.post("/cache/invalidate", response_model=dict)
-async def invalidate_cache(
+def invalidate_cache(
     cache_type: str = Form(...),
     pattern: str = Form(None),
     current_user: User = Depends(get_current_user)
 ):
     """Invalidate cache entries"""
     try:
-        from backend.utils.redis_cache import redis_cache, invalidate_analysis_cache, invalidate_llm_cache
-        
         if cache_type == "analysis":
             invalidate_analysis_cache()
         elif cache_type == "llm":
@@ -2307,3 +2451,22 @@ async def invalidate_cache(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to invalidate cache: {str(e)}"
         )
+
+if __name__ == "__main__":
+    import uvicorn
+    # Add separator to logs when starting the application
+    separator = "=" * 80
+    logger.info(f"\n{separator}\nUvicorn server starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{separator}\n")
+    
+    # Auto-reload is for local development only (ENV=dev); otherwise run several
+    # worker processes (WEB_CONCURRENCY). uvicorn picks uvloop/httptools automatically
+    # when installed. For production prefer gunicorn, see GETTING_STARTED.md
+    dev_mode = os.getenv("ENV", "").lower() == "dev"
+    uvicorn.run(
+        "main:app", 
+        host="0.0.0.0", 
+        port=int(os.getenv("PORT", 8000)), 
+        reload=dev_mode,
+        workers=1 if dev_mode else int(os.getenv("WEB_CONCURRENCY", 1)),
+        log_level="info"
+    )
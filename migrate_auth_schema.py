@@ -4,13 +4,65 @@ Migration script to add authentication columns to existing database
 """
 import sqlite3
 import os
-from backend.core.database import init_database, get_database_manager
+import shutil
+from sqlalchemy import LargeBinary, create_engine, inspect, text
+from backend.core.database import init_database, get_database_manager, add_user_full_name_column
 from backend.models.models import Base
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Indexes declared on the models after the first release. create_all only builds them
+# for new tables, so existing databases get them here (the syntax works on SQLite and
+# PostgreSQL alike); keyed by the table they belong to
+MODEL_INDEX_STATEMENTS = {
+    "analyses": [
+        "CREATE INDEX IF NOT EXISTS ix_analyses_user_started ON analyses (user_id, started_at)",
+        "CREATE INDEX IF NOT EXISTS ix_analyses_document_id ON analyses (document_id)",
+        "CREATE INDEX IF NOT EXISTS ix_analyses_status ON analyses (status)",
+    ],
+    "documents": [
+        "CREATE INDEX IF NOT EXISTS ix_documents_user_uploaded ON documents (user_id, upload_timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_documents_file_hash ON documents (file_hash) WHERE file_hash IS NOT NULL",
+    ],
+    "analysis_history": [
+        "CREATE INDEX IF NOT EXISTS ix_analysis_history_analysis_id ON analysis_history (analysis_id)",
+        "CREATE INDEX IF NOT EXISTS ix_analysis_history_user_id ON analysis_history (user_id)",
+    ],
+}
+
+# Timestamp columns stored as timezone-aware UTC (UTCDateTime in the models)
+TIMESTAMP_COLUMNS = {
+    "users": ["created_at", "last_activity", "last_login", "password_reset_expires"],
+    "documents": ["upload_timestamp"],
+    "analyses": ["started_at", "completed_at"],
+    "analysis_history": ["timestamp"],
+}
+
+def get_migration_engine():
+    """Engine for the configured database (DATABASE_URL, else the local SQLite file)"""
+    return create_engine(os.getenv("DATABASE_URL") or "sqlite:///financial_analyzer.db")
+
+def backup_database_file(src_path: str, dst_path: str):
+    """Copy the database file in-kernel (copy_file_range on Linux, shutil.copyfile elsewhere)"""
+    if not hasattr(os, "copy_file_range"):
+        shutil.copyfile(src_path, dst_path)
+        return
+    
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except OSError as e:
+        # e.g. EXDEV across filesystems on older kernels
+        logger.warning(f"copy_file_range failed, falling back to shutil.copyfile: {e}")
+        shutil.copyfile(src_path, dst_path)
+
 def migrate_database():
     """Migrate database schema to support authentication"""
     db_path = 'financial_analyzer.db'
@@ -18,8 +70,7 @@ def migrate_database():
     # Backup database first
     backup_path = f"{db_path}.backup_before_auth_migration"
     if os.path.exists(db_path):
-        import shutil
-        shutil.copy2(db_path, backup_path)
+        backup_database_file(db_path, backup_path)
         logger.info(f"Database backed up to {backup_path}")
     
     conn = sqlite3.connect(db_path)
@@ -32,49 +83,59 @@ def migrate_database():
         
         if 'email' in columns:
             logger.info("Database already has authentication columns")
-            return True
+        else:
+            logger.info("Adding authentication columns to users table...")
         
-        logger.info("Adding authentication columns to users table...")
+        # Authentication columns, keyed by column name
+        column_definitions = {
+            "email": "VARCHAR",
+            "username": "VARCHAR",
+            "password_hash": "VARCHAR",
+            "is_active": "BOOLEAN DEFAULT 1",
+
+            "first_name": "VARCHAR",
+            "last_name": "VARCHAR",
+            "failed_login_attempts": "INTEGER DEFAULT 0",
+            "last_login": "DATETIME",
+            "password_reset_token": "VARCHAR",
+            "password_reset_expires": "DATETIME"
+        }
         
-        # Add new columns for authentication
+        # Only add the columns the table is missing (one PRAGMA scan instead of
+        # catching "duplicate column name" per statement)
+        existing_columns = set(columns)
         migration_queries = [
-            "ALTER TABLE users ADD COLUMN email VARCHAR",
-            "ALTER TABLE users ADD COLUMN username VARCHAR", 
-            "ALTER TABLE users ADD COLUMN password_hash VARCHAR",
-            "ALTER TABLE users ADD COLUMN is_active BOOLEAN DEFAULT 1",
-
-            "ALTER TABLE users ADD COLUMN first_name VARCHAR",
-            "ALTER TABLE users ADD COLUMN last_name VARCHAR",
-            "ALTER TABLE users ADD COLUMN failed_login_attempts INTEGER DEFAULT 0",
-            "ALTER TABLE users ADD COLUMN last_login DATETIME",
-            "ALTER TABLE users ADD COLUMN password_reset_token VARCHAR",
-            "ALTER TABLE users ADD COLUMN password_reset_expires DATETIME"
+            f"ALTER TABLE users ADD COLUMN {name} {definition}"
+            for name, definition in column_definitions.items()
+            if name not in existing_columns
         ]
         
-        for query in migration_queries:
-            try:
-                cursor.execute(query)
-                logger.info(f"✅ Executed: {query}")
-            except sqlite3.OperationalError as e:
-                if "duplicate column name" in str(e).lower():
-                    logger.info(f"⚠️  Column already exists: {query}")
-                else:
-                    raise
-        
-        conn.commit()
-        logger.info("✅ Migration completed successfully!")
-        
-        # Create indexes for performance
+        # Create indexes for performance. They are UNIQUE like the ones the User model
+        # declares, so the login/registration lookups are single-row index probes;
+        # ANALYZE refreshes the planner statistics for the reshaped table. This step also
+        # runs on databases migrated earlier: an older non-unique index of the same name
+        # would make CREATE ... IF NOT EXISTS a no-op, so it is dropped first
+        cursor.execute("PRAGMA index_list(users)")
+        unique_by_name = {index[1]: bool(index[2]) for index in cursor.fetchall()}
         index_queries = [
-            "CREATE INDEX IF NOT EXISTS ix_users_email ON users(email)",
-            "CREATE INDEX IF NOT EXISTS ix_users_username ON users(username)"
+            f"DROP INDEX {name}"
+            for name in ("ix_users_email", "ix_users_username")
+            if unique_by_name.get(name) is False
+        ] + [
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users(email)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users(username)",
+            "ANALYZE users"
         ]
         
-        for query in index_queries:
+        # sqlite3 autocommits DDL, so open the transaction explicitly: every ALTER and
+        # index is written in one commit and a failure rolls all of them back
+        cursor.execute("BEGIN")
+        for query in migration_queries + index_queries:
             cursor.execute(query)
-            logger.info(f"✅ Created index: {query}")
+            logger.info(f"✅ Executed: {query}")
         
         conn.commit()
+        logger.info("✅ Migration completed successfully!")
         
         # Verify migration
         cursor.execute("PRAGMA table_info(users)")
@@ -93,9 +154,127 @@ def migrate_database():
     finally:
         conn.close()
 
+def create_missing_indexes(engine=None):
+    """Create the model indexes that databases built before they were declared lack"""
+    engine = engine or get_migration_engine()
+    
+    try:
+        tables = set(inspect(engine).get_table_names())
+        with engine.begin() as conn:
+            for table, statements in MODEL_INDEX_STATEMENTS.items():
+                if table not in tables:
+                    continue
+                for statement in statements:
+                    conn.execute(text(statement))
+                    logger.info(f"✅ Executed: {statement}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Index migration failed: {e}")
+        return False
+
+def migrate_document_hashes(engine=None):
+    """Convert documents.file_hash from hex text to the raw 32-byte SHA-256 digest"""
+    engine = engine or get_migration_engine()
+    
+    try:
+        inspector = inspect(engine)
+        if "documents" not in inspector.get_table_names():
+            logger.info("No documents table, nothing to convert")
+            return True
+        
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                # Rewrite the VARCHAR column as BYTEA, decoding each hex value on the way
+                column = next(col for col in inspector.get_columns("documents") if col["name"] == "file_hash")
+                if isinstance(column["type"], LargeBinary):
+                    converted = 0
+                else:
+                    converted = conn.execute(text("SELECT count(file_hash) FROM documents")).scalar()
+                    conn.execute(text(
+                        "ALTER TABLE documents ALTER COLUMN file_hash TYPE BYTEA USING decode(file_hash, 'hex')"
+                    ))
+            elif engine.dialect.name == "sqlite":
+                # SQLite columns are dynamically typed, so the BLOB values can be written in place
+                rows = conn.execute(
+                    text("SELECT id, file_hash FROM documents WHERE typeof(file_hash) = 'text'")
+                ).all()
+                if rows:
+                    conn.execute(
+                        text("UPDATE documents SET file_hash = :file_hash WHERE id = :id"),
+                        [{"file_hash": bytes.fromhex(file_hash), "id": doc_id} for doc_id, file_hash in rows]
+                    )
+                converted = len(rows)
+            else:
+                logger.error(f"❌ No file_hash conversion for {engine.dialect.name}; convert the column to binary by hand")
+                return False
+            
+            # Replace the full-column index with the partial one the Document model declares
+            conn.execute(text("DROP INDEX IF EXISTS ix_documents_file_hash"))
+            conn.execute(text(
+                "CREATE INDEX ix_documents_file_hash ON documents (file_hash) WHERE file_hash IS NOT NULL"
+            ))
+        logger.info(f"✅ Converted {converted} document hashes to binary")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Document hash migration failed: {e}")
+        return False
+
+def migrate_user_full_names(engine=None):
+    """Add the materialized users.full_name column and backfill it (same rules as compose_full_name)"""
+    engine = engine or get_migration_engine()
+    
+    try:
+        backfilled = add_user_full_name_column(engine)
+        logger.info(f"✅ Backfilled full_name for {backfilled} users")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ full_name migration failed: {e}")
+        return False
+
+def migrate_timestamps_to_utc(engine=None):
+    """Turn the PostgreSQL timestamp columns into TIMESTAMPTZ, reading existing values as UTC
+    
+    SQLite has no zone-aware type; UTCDateTime treats its stored values as UTC already.
+    """
+    engine = engine or get_migration_engine()
+    if engine.dialect.name != "postgresql":
+        return True
+    
+    try:
+        inspector = inspect(engine)
+        tables = set(inspector.get_table_names())
+        with engine.begin() as conn:
+            for table, column_names in TIMESTAMP_COLUMNS.items():
+                if table not in tables:
+                    continue
+                for column in inspector.get_columns(table):
+                    if column["name"] in column_names and not getattr(column["type"], "timezone", False):
+                        statement = (
+                            f"ALTER TABLE {table} ALTER COLUMN {column['name']} "
+                            f"TYPE TIMESTAMPTZ USING {column['name']} AT TIME ZONE 'UTC'"
+                        )
+                        conn.execute(text(statement))
+                        logger.info(f"✅ Executed: {statement}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Timestamp migration failed: {e}")
+        return False
+
 if __name__ == "__main__":
     print("🔄 Starting database migration for authentication...")
-    success = migrate_database()
+    engine = get_migration_engine()
+    # The auth-column step edits the SQLite file directly; the later steps run on any dialect
+    success = (
+        (engine.dialect.name != "sqlite" or migrate_database())
+        and migrate_document_hashes(engine)
+        and migrate_user_full_names(engine)
+        and create_missing_indexes(engine)
+        and migrate_timestamps_to_utc(engine)
+    )
     
     if success:
         print("\n🎉 Migration completed successfully!")
@@ -0,0 +1,65 @@
+"""
+AnalysisResponse serialization of analyses loaded with and without their document
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.models.models import Base, User, Document, Analysis, AnalysisResponse
+from backend.services.services import AnalysisService
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as setup:
+        user = User(email="analyst@example.com")
+        document = Document(user=user, original_filename="report.pdf", stored_filename="report.pdf", file_size=10)
+        setup.add(Analysis(user=user, document=document, query="Summarize", result="Done", status="completed"))
+        setup.commit()
+
+    # A fresh session, so nothing is served from the identity map
+    with Session() as session:
+        yield session
+    engine.dispose()
+
+def test_get_analysis_by_id_without_document(session):
+    analysis_id = session.query(Analysis.id).scalar()
+    session.expunge_all()
+
+    analysis = AnalysisService.get_analysis_by_id(session, analysis_id)
+    response = AnalysisResponse.model_validate(analysis)
+
+    assert response.id == analysis_id
+    assert response.document is None
+
+def test_get_analysis_by_id_with_document(session):
+    analysis_id = session.query(Analysis.id).scalar()
+    session.expunge_all()
+
+    analysis = AnalysisService.get_analysis_by_id(session, analysis_id, with_document=True)
+    response = AnalysisResponse.model_validate(analysis)
+
+    assert response.document.original_filename == "report.pdf"
+
+def test_get_user_analyses(session):
+    user_id = session.query(User.id).scalar()
+    session.expunge_all()
+
+    analyses, total_count = AnalysisService.get_user_analyses(session, user_id)
+    responses = [AnalysisResponse.model_validate(analysis) for analysis in analyses]
+
+    assert total_count == 1
+    assert responses[0].document.original_filename == "report.pdf"
+
+def test_document_kept_after_commit_expires_the_row(session):
+    analysis_id = session.query(Analysis.id).scalar()
+    session.expunge_all()
+
+    analysis = AnalysisService.get_analysis_by_id(session, analysis_id, with_document=True)
+    session.commit()
+    response = AnalysisResponse.model_validate(analysis)
+
+    assert response.document.original_filename == "report.pdf"
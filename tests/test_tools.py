@@ -0,0 +1,17 @@
+"""
+Keyword scans of the investment and risk analyzers
+"""
+from backend.utils.tools import _ascii_lowercase, _count_risks, _count_sentiment
+
+def test_ascii_lowercase_keeps_one_byte_per_character():
+    text = "Revenue\u00a0Growth \u2014 \u201cStrong\u201d"
+
+    assert _ascii_lowercase(text) == b"revenue growth    strong "
+    assert len(_ascii_lowercase(text)) == len(text)
+
+def test_non_ascii_punctuation_separates_terms():
+    # A no-break space keeps the two words of a term apart as a regular space would
+    assert _count_risks(_ascii_lowercase("Supply\u00a0chain issues"))["operational"] == 1
+    # Dropping the dash or apostrophe would join the fragments into "debt" and "loss"
+    assert _count_risks(_ascii_lowercase("de\u2014bt"))["debt"] == 0
+    assert _count_sentiment(_ascii_lowercase("lo\u2019ss"))["negative"] == 0